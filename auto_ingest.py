@@ -0,0 +1,79 @@
+import asyncio
+import logging
+
+import user_message_parser
+from instrumentation import log
+
+
+'''
+
+Auto-ingest: in channels that opt in, confirmation emails are picked up without a command.
+
+One regex scan for the known confirmation headers throws out ordinary chat before the real parser
+runs, and pastes that arrive in quick succession in the same channel are collected and handed to the
+handler as one batch, so a burst of emails turns into one Discord write per event.
+
+'''
+
+def looks_like_confirmation(content):
+    # One scan with the combined anchor pattern of every registered email format
+    return user_message_parser.detect_email_format(content) is not None
+
+
+class _IngestMessage:
+
+    def __init__(self, attachments):
+        self.attachments = attachments
+
+
+class ChannelContext:
+    '''
+
+    Minimal stand-in for commands.Context so command callbacks can run for a channel with no command message
+
+    '''
+
+    def __init__(self, channel, attachments=()):
+        self.channel = channel
+        self.guild = channel.guild
+        self.message = _IngestMessage(list(attachments))
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+class IngestDebouncer:
+    '''
+
+    Buffers texts per channel and calls handler(channel, text, attachments) once nothing new has arrived for `delay` seconds
+
+    '''
+
+    def __init__(self, handler, delay=3.0):
+        self.handler = handler
+        self.delay = delay
+        self._buffers = {}  # channel_id -> (channel, [texts], [attachments])
+        self._timers = {}  # channel_id -> pending flush task
+
+    def add(self, channel, text, attachments=()):
+        _, texts, buffered_attachments = self._buffers.setdefault(channel.id, (channel, [], []))
+        texts.append(text)
+        buffered_attachments.extend(attachments)
+        # Restart the quiet-period timer on every paste
+        timer = self._timers.get(channel.id)
+        if timer is not None:
+            timer.cancel()
+        self._timers[channel.id] = asyncio.ensure_future(self._flush_later(channel.id))
+
+    def pending(self):
+        return sum(len(texts) for _, texts, _ in self._buffers.values())
+
+    async def _flush_later(self, channel_id):
+        await asyncio.sleep(self.delay)
+        self._timers.pop(channel_id, None)
+        channel, texts, attachments = self._buffers.pop(channel_id)
+        try:
+            await self.handler(channel, "\n".join(texts), attachments)
+        except Exception as e:
+            # Nobody is awaiting this task, so make sure the failure shows up somewhere
+            log(logging.ERROR, "auto-ingest failed", channel=channel_id, pastes=len(texts), error=repr(e))
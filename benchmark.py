@@ -0,0 +1,248 @@
+import argparse
+import asyncio
+import os
+import random
+import re
+import string
+import time
+import timeit
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+
+import pytz
+
+import test
+import time_tokens
+import user_message_parser
+import mail_stream
+
+
+'''
+
+Benchmarks for the bot. Run with: python benchmark.py [micro|stream|commands] [options]
+
+micro     parser/email-format/time-token microbenchmarks
+stream    streams a synthetic .mbox export through mail_stream and reports bookings/s and peak memory
+commands  drives schedule_event, update_event and get_events against fake_discord's
+          offline guild with synthetic confirmation emails (e.g. 10k bookings across 200 rooms)
+
+'''
+
+
+def legacy_get_event_parameters_from_GT(message: str):
+    # The original five-regex + strptime parser, kept here only as a baseline to compare against
+    event_name_match = re.search(r'The following bookings "(.*?)" have been confirmed:', message)
+    event_name = event_name_match.group(1) if event_name_match else None
+    location_match = re.search(r'Space: (.+)', message)
+    location = location_match.group(1) if location_match else None
+    checkin_code_match = re.search(r'Check In Code: (.+)', message)
+    checkin_code = checkin_code_match.group(1) if checkin_code_match else None
+    date_match = re.search(r'Date: [A-Za-z]+, ([A-Za-z]+ \d{1,2}, \d{4})', message)
+    time_match = re.search(r'Time: (\d{1,2}:\d{2}[apm]+) - (\d{1,2}:\d{2}[apm]+)', message)
+    if not date_match or not time_match:
+        raise ValueError("Invalid input format")
+    date = date_match.group(1)
+    start_datetime = datetime.strptime(f"{date} {time_match.group(1)}", "%B %d, %Y %I:%M%p")
+    end_datetime = datetime.strptime(f"{date} {time_match.group(2)}", "%B %d, %Y %I:%M%p")
+    local_tz = pytz.timezone("America/New_York")
+    start_datetime = local_tz.localize(start_datetime)
+    end_datetime = local_tz.localize(end_datetime)
+    return {
+        "event_name": event_name,
+        "location": location,
+        "description": f'{start_datetime.strftime("%I:%M%p")} - {end_datetime.strftime("%I:%M%p")}: {checkin_code}',
+        "start_time": start_datetime.astimezone(timezone.utc).isoformat(),
+        "end_time": end_datetime.astimezone(timezone.utc).isoformat()
+    }
+
+
+def report(name, seconds, number):
+    print(f"{name:<40} {seconds / number * 1e6:8.2f} us/call")
+    return seconds
+
+
+def bench_booking_parser(number=20000):
+    print("Booking parser (sample email from test.py)")
+    assert legacy_get_event_parameters_from_GT(test.text) == user_message_parser.get_event_parameters_from_GT(test.text)
+    legacy = report("legacy get_event_parameters_from_GT", timeit.timeit(lambda: legacy_get_event_parameters_from_GT(test.text), number=number), number)
+    current = report("parse_booking_from_GT", timeit.timeit(lambda: user_message_parser.parse_booking_from_GT(test.text), number=number), number)
+    report("get_event_parameters_from_GT (compat)", timeit.timeit(lambda: user_message_parser.get_event_parameters_from_GT(test.text), number=number), number)
+    print(f"speedup: {legacy / current:.1f}x\n")
+
+
+# One sample confirmation per registered email format
+EMAIL_FIXTURES = {"georgia_tech": test.text, "ems": test.ems_text}
+
+
+def bench_email_formats(number=20000):
+    print("Email format plugins (dispatch + parse, fixtures from test.py)")
+    assert set(EMAIL_FIXTURES) == set(user_message_parser.EMAIL_FORMATS), "every registered format needs a fixture"
+    expected = user_message_parser.parse_booking(test.text)
+    for name, fixture in EMAIL_FIXTURES.items():
+        booking = user_message_parser.parse_booking(fixture)
+        assert user_message_parser.detect_email_format(fixture) == name
+        assert (booking.event_name, booking.start_time, booking.end_time) == (expected.event_name, expected.start_time, expected.end_time)
+        seconds = report(f"{name} parse_booking", timeit.timeit(lambda: user_message_parser.parse_booking(fixture), number=number), number)
+        print(f"{'':<40} {number / seconds:8.0f} bookings/s")
+    report("detect_email_format (no match)", timeit.timeit(lambda: user_message_parser.detect_email_format("see you all at 6 tonight!"), number=number), number)
+    print()
+
+
+def bench_time_tokens(number=200000):
+    print("Clock token parsing/formatting")
+    tokens = ["6:00PM", "10:30am", "12:00AM", "06:45pm"]
+    legacy = report("datetime.strptime", timeit.timeit(lambda: [datetime.strptime(token, "%I:%M%p") for token in tokens], number=number // len(tokens)), number)
+    current = report("time_tokens.parse_clock", timeit.timeit(lambda: [time_tokens.parse_clock(token) for token in tokens], number=number // len(tokens)), number)
+    print(f"parse speedup: {legacy / current:.1f}x")
+    parsed = datetime.strptime("6:00PM", "%I:%M%p")
+    legacy = report("strftime + lstrip", timeit.timeit(lambda: parsed.strftime("%I:%M%p").lstrip("0"), number=number), number)
+    current = report("time_tokens.format_clock", timeit.timeit(lambda: time_tokens.format_clock(1080), number=number), number)
+    print(f"format speedup: {legacy / current:.1f}x\n")
+
+
+def synthetic_confirmation(name, room, day, start_minute, end_minute, code):
+    # Same layout as the Georgia Tech email in test.py
+    return test.text.replace('"STUDY SLAY"', f'"{name}"').replace(
+        "Space: Price Gilbert 2216", f"Space: {room}").replace(
+        "Date: Sunday, November 17, 2024", f"Date: {day.strftime('%A, %B')} {day.day}, {day.year}").replace(
+        "Time: 6:00pm - 8:00pm", f"Time: {time_tokens.format_clock(start_minute).lower()} - {time_tokens.format_clock(end_minute).lower()}").replace(
+        "Check In Code: P7T4", f"Check In Code: {code}")
+
+
+def synthetic_bookings(bookings, rooms, days=14, seed=0):
+    '''
+
+    Returns {(room, day): [confirmation email, ...]} with consecutive 1-hour slots per room and day
+
+    '''
+    rng = random.Random(seed)
+    first_day = date(2024, 11, 17)
+    per_event = {}
+    for _ in range(bookings):
+        room = f"Price Gilbert {2000 + rng.randrange(rooms)}"
+        day = first_day + timedelta(days=rng.randrange(days))
+        per_event.setdefault((room, day), []).append(None)
+    emails = {}
+    for (room, day), slots in per_event.items():
+        start = 8 * 60 + rng.randrange(4) * 60
+        emails[(room, day)] = [
+            synthetic_confirmation(f"GROUP {room[-4:]}", room, day, start + 60 * i, start + 60 * (i + 1),
+                                   "".join(rng.choices(string.ascii_uppercase + string.digits, k=4)))
+            for i in range(len(slots))
+        ]
+    return emails
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] if samples else 0.0
+
+
+async def run_command_benchmark(bookings, rooms, latency, concurrency, window, list_calls, allocations):
+    # The bot module connects nothing at import, but it does open the booking store, so keep that in memory
+    os.environ["BOOKING_DB"] = ":memory:"
+    import bot
+    import fake_discord
+
+    bot.write_queue.window = window
+    guild = fake_discord.FakeGuild(latency=latency)
+    emails = synthetic_bookings(bookings, rooms)
+    latencies = {"schedule_event": [], "update_event": [], "get_events": []}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(command, arg=None):
+        ctx = fake_discord.FakeContext(guild)
+        async with semaphore:
+            started = time.perf_counter()
+            if arg is None:
+                await getattr(bot, command).callback(ctx)
+            else:
+                await getattr(bot, command).callback(ctx, arg=arg)
+            latencies[command].append(time.perf_counter() - started)
+
+    if allocations:
+        tracemalloc.start()
+    started = time.perf_counter()
+    # First booking of each room/day creates the event, the rest extend it
+    await asyncio.gather(*(timed("schedule_event", event_emails[0]) for event_emails in emails.values()))
+    await asyncio.gather(*(timed("update_event", email) for event_emails in emails.values() for email in event_emails[1:]))
+    await asyncio.gather(*(timed("get_events") for _ in range(list_calls)))
+    elapsed = time.perf_counter() - started
+    if allocations:
+        current, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics("lineno")[:5]
+        tracemalloc.stop()
+
+    print(f"Commands: {bookings} bookings across {rooms} rooms, {len(emails)} events, latency {latency * 1000:.0f}ms, concurrency {concurrency}")
+    for command, samples in latencies.items():
+        if samples:
+            print(f"{command:<16} n={len(samples):<6} p50 {percentile(samples, 0.5) * 1000:8.2f}ms  p99 {percentile(samples, 0.99) * 1000:8.2f}ms")
+    print(f"API calls: {dict(guild.api_calls)}")
+    print(f"Total {elapsed:.2f}s ({bookings / elapsed:.0f} bookings/s)")
+    if allocations:
+        print(f"Allocations: current {current / 1e6:.1f}MB, peak {peak / 1e6:.1f}MB")
+        for stat in top:
+            print(f"  {stat}")
+
+
+def write_synthetic_mbox(path, bookings, rooms, duplicate_every=10):
+    # An mbox export: From_ line and headers per message, the confirmation as the body, plus some forwarded duplicates
+    count = 0
+    with open(path, "w") as mbox:
+        for (room, day), emails in synthetic_bookings(bookings, rooms).items():
+            for email in emails:
+                mbox.write(f"From library@gatech.edu Sun Nov 17 12:00:00 2024\nFrom: library@gatech.edu\n"
+                           f"Subject: Booking confirmed\nDate: Sun, 17 Nov 2024 12:00:00 -0500\n\n{email}\n")
+                count += 1
+                if count % duplicate_every == 0:
+                    mbox.write(f"From someone@gatech.edu Sun Nov 17 12:05:00 2024\nSubject: Fwd: Booking confirmed\n\n{email}\n")
+    return count
+
+
+def stream_file(path):
+    stream = mail_stream.ConfirmationStream(pytz.timezone("America/New_York"))
+    parsed = 0
+    for chunk in mail_stream.file_chunks(path):
+        parsed += sum(1 for _ in stream.feed(chunk))
+    parsed += sum(1 for _ in stream.end())
+    return stream, parsed
+
+
+def bench_stream(bookings, rooms, path="benchmark.mbox"):
+    written = write_synthetic_mbox(path, bookings, rooms)
+    size = os.path.getsize(path)
+    stream, parsed = stream_file(path)
+    rate = stream.rate()
+    # Second pass under tracemalloc (which slows everything down) just for the memory peak
+    tracemalloc.start()
+    stream_file(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    os.remove(path)
+    assert parsed == written and stream.failed == 0, (parsed, written, stream.failed)
+    print(f"Stream: {size / 1e6:.1f} MB mbox, {written} confirmations, {stream.duplicates} duplicates skipped")
+    print(f"{parsed} bookings at {rate:.0f} bookings/s, peak traced memory {peak / 1e6:.2f} MB "
+          f"(includes the dedupe keys of all {parsed} bookings)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the event scheduler bot")
+    parser.add_argument("suite", nargs="?", choices=["micro", "stream", "commands"], default="micro")
+    parser.add_argument("--bookings", type=int, default=10000)
+    parser.add_argument("--rooms", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="fake Discord API latency in ms")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--window", type=float, default=0.01, help="write queue coalescing window in s")
+    parser.add_argument("--list-calls", type=int, default=20)
+    parser.add_argument("--allocations", action="store_true", help="trace allocations (slow)")
+    args = parser.parse_args()
+
+    if args.suite == "micro":
+        bench_booking_parser()
+        bench_email_formats()
+        bench_time_tokens()
+    elif args.suite == "stream":
+        bench_stream(args.bookings, args.rooms)
+    else:
+        asyncio.run(run_command_benchmark(args.bookings, args.rooms, args.latency / 1000, args.concurrency,
+                                          args.window, args.list_calls, args.allocations))
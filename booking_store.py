@@ -0,0 +1,230 @@
+import os
+import sqlite3
+import time
+from datetime import date
+
+import user_message_parser
+from time_tokens import MINUTES_PER_DAY
+
+
+'''
+
+Local SQLite store of every booking the bot has seen. This is the source of truth for an event's
+slots and check-in codes; Discord event descriptions are rendered from it instead of being parsed back.
+
+Slots are stored against the event they belong to: local_date is the event's local date and
+start_minute is minutes past midnight (0-1439) with end_minute = start_minute + duration.
+
+'''
+
+DEFAULT_DB_PATH = os.getenv("BOOKING_DB", "bookings.db")
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS bookings (
+    guild_id INTEGER NOT NULL,
+    event_id INTEGER,
+    location TEXT NOT NULL,
+    local_date TEXT NOT NULL,
+    start_minute INTEGER NOT NULL,
+    end_minute INTEGER NOT NULL,
+    checkin_code TEXT NOT NULL,
+    event_name TEXT,
+    UNIQUE (guild_id, location, local_date, start_minute, end_minute, checkin_code)
+);
+CREATE INDEX IF NOT EXISTS bookings_by_day ON bookings (guild_id, location, local_date);
+CREATE INDEX IF NOT EXISTS bookings_by_event ON bookings (guild_id, event_id);
+CREATE TABLE IF NOT EXISTS bookings_archive (
+    guild_id INTEGER NOT NULL,
+    event_id INTEGER,
+    location TEXT NOT NULL,
+    local_date TEXT NOT NULL,
+    start_minute INTEGER NOT NULL,
+    end_minute INTEGER NOT NULL,
+    checkin_code TEXT NOT NULL,
+    event_name TEXT
+);
+CREATE TABLE IF NOT EXISTS guild_settings (
+    guild_id INTEGER PRIMARY KEY,
+    timezone TEXT
+);
+CREATE TABLE IF NOT EXISTS imported_guilds (
+    guild_id INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ingest_channels (
+    channel_id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL
+);
+'''
+
+
+def time_of_day_slot(slot):
+    # SlotSet may hold next-day slots as 1440+; the store always keeps the time-of-day form
+    start, end, code = slot
+    return start % MINUTES_PER_DAY, start % MINUTES_PER_DAY + end - start, code
+
+
+class BookingStore:
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        # WAL lets readers keep going while a booking is being written
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def record_slots(self, guild_id, event_id, location, local_date, slot_set, event_name=None):
+        '''
+
+        Records slots (a SlotSet or (start, end, code) tuples) for an event. A slot already stored under
+        another event (one deleted while the bot was offline, say) moves to this one
+
+        '''
+        rows = [
+            (guild_id, event_id, location.lower(), local_date.isoformat(), start, end, code, event_name)
+            for start, end, code in map(time_of_day_slot, slot_set)
+        ]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO bookings VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (guild_id, location, local_date, start_minute, end_minute, checkin_code) "
+                "DO UPDATE SET event_id = excluded.event_id, event_name = excluded.event_name",
+                rows
+            )
+
+    def has_event(self, guild_id, event_id):
+        row = self.connection.execute(
+            "SELECT 1 FROM bookings WHERE guild_id = ? AND event_id = ? LIMIT 1", (guild_id, event_id)
+        ).fetchone()
+        return row is not None
+
+    def slots_for_event(self, guild_id, event_id):
+        rows = self.connection.execute(
+            "SELECT start_minute, end_minute, checkin_code FROM bookings WHERE guild_id = ? AND event_id = ?",
+            (guild_id, event_id)
+        ).fetchall()
+        return user_message_parser.SlotSet(rows)
+
+    def bookings_between(self, guild_id, first_date, last_date):
+        '''
+
+        Returns (location, local_date, start_minute, end_minute, checkin_code, event_name) rows for a date range
+
+        '''
+        rows = self.connection.execute(
+            "SELECT location, local_date, start_minute, end_minute, checkin_code, event_name FROM bookings "
+            "WHERE guild_id = ? AND local_date BETWEEN ? AND ?",
+            (guild_id, first_date.isoformat(), last_date.isoformat())
+        ).fetchall()
+        return [(location, date.fromisoformat(local_date), start, end, code, name) for location, local_date, start, end, code, name in rows]
+
+    def delete_event(self, guild_id, event_id):
+        with self.connection:
+            self.connection.execute("DELETE FROM bookings WHERE guild_id = ? AND event_id = ?", (guild_id, event_id))
+
+    def delete_missing_events(self, guild_id, event_ids, local_date, minute):
+        '''
+
+        Deletes a guild's bookings that haven't ended by `minute` past midnight on local_date and whose event
+        isn't in event_ids (it was deleted while the bot wasn't listening). Bookings that already ended are
+        left for the archive, since Discord drops finished events from its list too. Returns how many were deleted
+
+        '''
+        not_ended = "guild_id = ? AND event_id IS NOT NULL AND (local_date > ? OR (local_date = ? AND end_minute > ?))"
+        args = (guild_id, local_date.isoformat(), local_date.isoformat(), minute)
+        stored = {event_id for (event_id,) in self.connection.execute(f"SELECT DISTINCT event_id FROM bookings WHERE {not_ended}", args)}
+        deleted = 0
+        with self.connection:
+            for event_id in stored - set(event_ids):
+                deleted += self.connection.execute(
+                    f"DELETE FROM bookings WHERE {not_ended} AND event_id = ?", args + (event_id,)
+                ).rowcount
+        return deleted
+
+    def archive_before(self, guild_id, local_date):
+        '''
+
+        Moves a guild's bookings dated before local_date into bookings_archive. Returns how many were moved
+
+        '''
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO bookings_archive SELECT * FROM bookings WHERE guild_id = ? AND local_date < ?",
+                (guild_id, local_date.isoformat())
+            )
+            moved = self.connection.execute(
+                "DELETE FROM bookings WHERE guild_id = ? AND local_date < ?", (guild_id, local_date.isoformat())
+            ).rowcount
+        return moved
+
+    def get_timezones(self):
+        return self.connection.execute("SELECT guild_id, timezone FROM guild_settings WHERE timezone IS NOT NULL").fetchall()
+
+    def set_timezone(self, guild_id, name):
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO guild_settings (guild_id, timezone) VALUES (?, ?) "
+                "ON CONFLICT (guild_id) DO UPDATE SET timezone = excluded.timezone",
+                (guild_id, name)
+            )
+
+    def get_ingest_channels(self):
+        return {channel_id for (channel_id,) in self.connection.execute("SELECT channel_id FROM ingest_channels")}
+
+    def set_ingest_channel(self, guild_id, channel_id, enabled):
+        with self.connection:
+            if enabled:
+                self.connection.execute("INSERT OR IGNORE INTO ingest_channels VALUES (?, ?)", (channel_id, guild_id))
+            else:
+                self.connection.execute("DELETE FROM ingest_channels WHERE channel_id = ?", (channel_id,))
+
+    def acquire_lease(self, name, owner, ttl):
+        '''
+
+        Takes (or renews) a named lease for ttl seconds unless another owner holds an unexpired one.
+        Every bot process shares this database, so this is how work that must happen once (the import
+        back-fill, reconcile passes) is split between shard processes. Returns True if owner holds the lease
+
+        '''
+        now = time.time()
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO leases VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+                (name, owner, now + ttl, now)
+            )
+            row = self.connection.execute("SELECT owner FROM leases WHERE name = ?", (name,)).fetchone()
+        return row is not None and row[0] == owner
+
+    def is_imported(self, guild_id):
+        return self.connection.execute("SELECT 1 FROM imported_guilds WHERE guild_id = ?", (guild_id,)).fetchone() is not None
+
+    def import_events(self, guild_id, events, local_tz):
+        '''
+
+        One-time back-fill: records the slots in every existing event description for a guild.
+        Returns the number of slots found
+
+        '''
+        found = 0
+        for event in events:
+            if not event.location or not event.description:
+                continue
+            slot_set = user_message_parser.SlotSet.from_description(event.description)
+            if not slot_set:
+                continue
+            self.record_slots(guild_id, event.id, event.location, event.start_time.astimezone(local_tz).date(), slot_set, event.name)
+            found += len(slot_set)
+        with self.connection:
+            self.connection.execute("INSERT OR IGNORE INTO imported_guilds VALUES (?)", (guild_id,))
+        return found
@@ -1,104 +1,231 @@
+import time
+_process_started = time.perf_counter()
+
+# Started directly: hand over to run_bot.py before any setup runs, since spawned parse workers re-import
+# the __main__ module and everything below would run again in each of them
+if __name__ == "__main__":
+    import os
+    import sys
+    os.execv(sys.executable, [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_bot.py")] + sys.argv[1:])
+
+# Load environment variables from .env first, since several modules read their settings at import
+from dotenv import load_dotenv
+load_dotenv()
+
+# --profile-startup: cost of each phase from here until every guild is warmed up
+from instrumentation import Instrumentation, StartupProfile, log, setup_logging, timed_command, STATS_PROM_PATH
+startup = StartupProfile(_process_started)
+startup.mark("load .env")
+
+import argparse
+import asyncio
 import discord
 from discord import EntityType, PrivacyLevel
 from discord.ext import commands
-from dotenv import load_dotenv
+import logging
 import os
+import socket
+from datetime import date, datetime, timedelta
+startup.mark("import discord.py")
+
 import user_message_parser
-from datetime import datetime, timezone, timedelta
-import pytz
+from event_cache import EventCache
+from write_queue import EventWriteQueue
+from event_locks import EventLocks
+from booking_store import BookingStore
+from interactions import BookingModal, run_deferred
+import event_pages
+import auto_ingest
+import recurrence
+from bulk_create import run_throttled
+from reconciler import Reconciler
+import parse_pool
+import conflicts
+import mail_stream
+from dedup_index import DedupIndex, booking_key, text_key
+from time_tokens import format_clock
+import timezones
+startup.mark("import bot modules")
 
-# Load environment variables from .env
-load_dotenv()
 TOKEN = os.getenv('DISCORD_TOKEN')  # Your bot token from .env file
 
 # Intents are required for the bot to interact with the server
 intents = discord.Intents.default()  # Adjust intents as needed
 intents.guild_scheduled_events = True  # Ensures the bot can connect to guilds
-intents.message_content = True
+# Prefix ("<3") commands need the privileged message content intent, which sends every message in every
+# guild to the bot. With PREFIX_COMMANDS=0 only the slash commands are used and that firehose is off,
+# which also means auto-ingest can't read pasted confirmations, so it can't be turned on in that mode.
+PREFIX_COMMANDS = os.getenv("PREFIX_COMMANDS", "1") != "0"
+intents.message_content = PREFIX_COMMANDS
+
+# Sharding: SHARD_COUNT shards in total, of which this process runs SHARD_IDS (comma separated, default all).
+# shard_launcher.py starts one process per group of shards; they share the booking store database.
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+SHARD_IDS = [int(shard_id) for shard_id in os.getenv("SHARD_IDS", "").split(",") if shard_id.strip()] or None
 
 # Create bot instance
-bot = commands.Bot(command_prefix="<3", intents=intents)
+if SHARD_COUNT or SHARD_IDS:
+    bot = commands.AutoShardedBot(command_prefix="<3", intents=intents, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+else:
+    bot = commands.Bot(command_prefix="<3", intents=intents)
+
+# Names this process in the booking store's lease table
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Every booking the bot has seen; event descriptions are rendered from here
+booking_store = BookingStore()
+
+# Scheduled events per guild, kept current by the gateway so commands don't need a REST fetch
+guild_timezones = timezones.GuildTimezones()
+for guild_id, timezone_name in booking_store.get_timezones():
+    guild_timezones.set(guild_id, timezone_name)
+event_cache = EventCache(guild_timezones)
+
+# Edits to the same event that land close together go out as one PATCH
+write_queue = EventWriteQueue(merge_description=user_message_parser.merge_descriptions, on_written=event_cache.upsert)
+
+# Per-(guild, event) locks around reading, merging and queueing an event's description
+event_locks = EventLocks()
+
+# Rolling per-stage timings for <3stats
+stats = Instrumentation()
+stats_task = None  # writes the Prometheus text file when STATS_PROM_PATH is set
+
+# Rendered get_events pages per guild and filter
+page_cache = event_pages.PageCache()
+
+# Channels where confirmation emails are picked up without a command
+ingest_channels = booking_store.get_ingest_channels()
+
+# Periodic refresh/prune/archive/normalize pass over every guild
+reconciler = Reconciler(event_cache, booking_store, write_queue, event_locks, guild_timezones, INSTANCE_ID)
+reconcile_task = None
+
+# Confirmations already applied per guild, so repeats are answered without touching Discord
+dedup_index = DedupIndex()
+
+# Guilds are loaded into the event cache after ready, this many at a time
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "4"))
+warmup_task = None
+profile_startup = False  # set by --profile-startup
+startup.mark("open store and caches")
 
 #Given event data, will check if event exists
-async def get_event(ctx, event_data):
+async def get_event(ctx, booking):
     guild = ctx.guild  # Access the guild (server) where the command is invoked
     if not guild:
         await ctx.send("This command can only be used in a guild.")
         return
-    guild_events = await guild.fetch_scheduled_events()
-    # for event in guild_events:
-    #     if(event.location == event_data["location"] and (event.end_time == event_data["start_time"] or event.start_time == event_data["end_time"])):
-    #         return event
-    for event in guild_events:
-        # Match event based on name, start_time, and location
-        if (
-            event.name == event_data["event_name"]
-            and event.start_time == datetime.fromisoformat(event_data["start_time"]).replace(tzinfo=timezone.utc)
-            and (event.location).lower() == event_data["location"].lower()
-        ):
+    event_index = await event_cache.get_index(guild)
+    # Only events at the same (location, date) can match, so just look in that bucket
+    for event in event_index.events_at(booking.location, booking.start_time):
+        # Match event based on name and start_time
+        if event.name == booking.event_name and event.start_time == booking.start_time:
             return event
     return None
 
 
-async def get_event_to_update(ctx, event_data):
+async def get_event_to_update(ctx, booking):
     guild = ctx.guild  # Access the guild (server) where the command is invoked
     if not guild:
         await ctx.send("This command can only be used in a guild.")
         return
 
-    guild_events = await guild.fetch_scheduled_events()
-
-    # Parse start and end times from event_data
-    new_start_time = datetime.fromisoformat(event_data["start_time"]).replace(tzinfo=timezone.utc)
-    new_end_time = datetime.fromisoformat(event_data["end_time"]).replace(tzinfo=timezone.utc)
-    location = event_data["location"].lower()
-    add_description = event_data["description"]
-    # Define the local timezone (e.g., New York/Atlanta)
-    local_tz = pytz.timezone("America/New_York")
-
-    # Localize the new event times to the local timezone
-    new_start_local = new_start_time.astimezone(local_tz)
-    new_end_local = new_end_time.astimezone(local_tz)
-    new_event_date = new_start_local.date()
-
-    # Iterate through the events to find a matching one based on location and overlapping times
-    for event in guild_events:
-        # Localize the existing event's times to the local timezone
-        event_start_local = event.start_time.astimezone(local_tz)
-        event_end_local = event.end_time.astimezone(local_tz)
-        event_date = event_start_local.date()  # Date of the existing event
-
-        # print("current event being looked at", event_date)
-        # print("the date of the event trying to add", new_event_date)
-
-        # Ensure the new event's date matches or accounts for midnight crossover
-        if not (event_date == new_event_date or
-                (new_start_local.time() > new_end_local.time() and new_event_date == event_date - timedelta(days=1))):
-            continue  # Skip this event if the dates do not align
-
-        if event.location and event.location.lower() == location:
-            # Check if the event times overlap or are adjacent
-            if ((event_start_local <= new_start_local <= event_end_local) or  # New event starts within the current event time range
-                (event_start_local <= new_end_local <= event_end_local) or  # New event ends within the current event time range
-                (new_start_local <= event_start_local and new_end_local >= event_end_local)):  # New event fully encompasses the current one
-                # If the times overlap or are adjacent, extend the event's time range
-                updated_start_time = min(event.start_time, new_start_time)
-                updated_end_time = max(event.end_time, new_end_time)
-
-                # Return the event with updated times
-                return event, {
-                    "location": location,
-                    "description": add_description,
-                    "start_time": updated_start_time,
-                    "end_time": updated_end_time
-                }
-
-            # If there's a gap, append the new description without updating the time
-            if new_start_time > event.end_time or new_end_time < event.start_time:
-                return event, {"description": add_description}
-
-    # If no event is found to update
-    return None
+    with stats.time("update_event", "fetch"):
+        event_index = await event_cache.get_index(guild)
+
+    new_start_time = booking.start_utc
+    new_end_time = booking.end_utc
+    location = booking.location.lower()
+    add_description = booking.description
+
+    # Look up the event at this location on the same local date (or the next one if the booking crosses midnight,
+    # or the previous one if it continues that night's event past midnight)
+    with stats.time("update_event", "match"):
+        match = event_index.find_match(location, new_start_time, new_end_time)
+    if match is None:
+        # If no event is found to update
+        return None
+
+    event, touching = match
+    if touching:
+        # If the times overlap or are adjacent, extend the event's time range
+        updated_start_time = min(event.start_time, new_start_time)
+        updated_end_time = max(event.end_time, new_end_time)
+
+        # Return the event with updated times
+        return event, {
+            "location": location,
+            "description": add_description,
+            "start_time": updated_start_time,
+            "end_time": updated_end_time
+        }
+
+    # If there's a gap, append the new description without updating the time
+    return event, {"description": add_description}
+
+
+
+def local_event_date(guild, start_time):
+    # Dates in descriptions are local, so use the guild's local date rather than the UTC one
+    return timezones.local_date(start_time, guild_timezones.get(guild.id))
+
+
+def event_slots(guild, event):
+    '''
+
+    Returns the event's SlotSet from the booking store. An event the store hasn't seen yet
+    (made by hand or before the store existed) is back-filled from its description first
+
+    '''
+    if not booking_store.has_event(guild.id, event.id):
+        slot_set = user_message_parser.SlotSet.from_description(event.description)
+        booking_store.record_slots(guild.id, event.id, event.location, local_event_date(guild, event.start_time), slot_set, event.name)
+        return slot_set
+    return booking_store.slots_for_event(guild.id, event.id)
+
+
+def record_bookings(guild, event_id, location, event_date, bookings):
+    # Each booking keeps its own group name in the store (a merged event can hold several groups' bookings)
+    slots_by_name = {}
+    for booking in bookings:
+        slots_by_name.setdefault(booking.event_name, []).append(booking.slot)
+    for event_name, slots in slots_by_name.items():
+        booking_store.record_slots(guild.id, event_id, location, event_date, slots, event_name)
+
+
+def conflict_warnings(guild, recorded):
+    '''
+
+    Describes every overlap between the just-recorded bookings, given as (location, event's local date, slot),
+    and other groups' bookings in the same room or the same group's bookings in other rooms
+
+    '''
+    if not recorded:
+        return []
+    dates = [local_date for _, local_date, _ in recorded]
+    # A day either side catches bookings that run across midnight
+    rows = booking_store.bookings_between(guild.id, min(dates) - timedelta(days=1), max(dates) + timedelta(days=1))
+    return [conflict.describe() for conflict in conflicts.conflicts_for(conflicts.slots_from_rows(rows), recorded)]
+
+
+def event_times_from_slots(guild, slot_set, event_date):
+    '''
+
+    Takes in a SlotSet and the event's local date (in the guild's timezone) and returns the
+    (start_utc, end_utc, start_minute, end_minute) of its largest continuous interval, or None
+
+    '''
+    largest_interval = slot_set.largest_interval()
+    if not largest_interval:
+        return None
+
+    earliest_start_minute, latest_end_minute = largest_interval
+
+    # Minutes past midnight (1440+ for slots that run into the next day) on the event's local date
+    [(earliest_start_utc, latest_end_utc)] = timezones.slots_to_utc(event_date, [largest_interval], guild_timezones.get(guild.id))
+
+    return earliest_start_utc, latest_end_utc, earliest_start_minute, latest_end_minute
 
 
 
@@ -109,12 +236,17 @@ async def bot_help(ctx):
         await ctx.send("This command can only be used in a guild.")
         return
     await ctx.send('''Hello, this is hoangyen's shitty event scheduler: Event Scheduler Slay! I was really lazy to do basic checks so here are the rules:
-                    1. Please do not use 12am. The bot hates it and GPT nor I could figure it out. If your event ends at 12am, please but 11:45pm ty.
-                    Also, the time is EST. (hardcoded sry)
+                    1. Bookings that run past midnight (e.g. 10:00pm - 12:00am, then 12:00am - 2:00am) are merged into the same night's event.
+                    Also, times are in the server's timezone (EST unless someone ran <3set_timezone)
                     2. Use "<3" to ask the bot to create/update your booking event
-                    3. Two functions for you to use:
+                    3. Functions for you to use:
                         a) <3schedule_event, will schedule an event. DOES NOT LOOK FOR EXISTING EVENTS
                         b) <3update_event, parses through your input and uses {location, date_of_event} as a unique identifier for event. Title of event is not unique/doesn't matter
+                        c) <3batch_import, paste many confirmations (or attach .txt/.eml files, or a whole exported .mbox mailbox) and they get merged into one create/update per event
+                        Slash commands /schedule, /update, /list and /batch_import do the same thing with a paste box (or attachment)
+                        d) <3schedule_recurring "NAME" every Sunday 6-8pm in Price Gilbert 2216 until Dec 15 (optionally: starting Nov 17), creates every week that doesn't have an event yet
+                        e) <3conflicts [from] [to], lists rooms booked by two groups at once and groups holding two rooms at once (dates like 2024-11-17, default: next 30 days)
+                        f) <3auto_ingest on (or /auto_ingest), then just paste confirmations in that channel and the bot creates/updates events on its own. Not available when the bot runs with PREFIX_COMMANDS=0
                     4. Example input: 
                     The following bookings "STUDY SLAY" have been confirmed:
 
@@ -131,6 +263,7 @@ async def bot_help(ctx):
                     You are required to check in to your room on the display. If you do not check in within 10 minutes of your reservation, your reservation will be cancelled, and someone could book that room.
 
                     Check In Code: P7T4
+                    EMS confirmations ("Reservation Confirmed" / Event Name / Room / Date / Time / Confirmation #) work too
                     4. TY EVERYONE
                     ''')
 
@@ -142,24 +275,49 @@ async def test(ctx, arg):
     await ctx.send(arg)
 
 @bot.command(name="get_events")
-async def get_events(ctx):
+@timed_command(stats, "get_events")
+async def get_events(ctx, *, arg=""):
     guild = ctx.guild  # Access the guild (server) where the command is invoked
     if not guild:
         await ctx.send("This command can only be used in a guild.")
         return
-    
+
+    try:
+        first_date, last_date, location = event_pages.parse_event_filters(arg)
+    except ValueError:
+        await ctx.send("Dates should look like from:2024-11-01 to:2024-11-30")
+        return
+
     try:
         # Fetch the scheduled events for the guild
-        events = await guild.fetch_scheduled_events()
+        with stats.time("get_events", "fetch"):
+            events = await event_cache.get_events(guild)
 
         # If there are no events, let the user know
         if not events:
             await ctx.send("There are no upcoming events for this guild.")
             return
 
-        # Format and send the events as a message
-        event_list = "\n".join([f"**{event.name}**\nStart: {event.start_time.strftime('%A, %B %d, %Y at %I:%M %p')}\nEnd: {event.end_time.strftime('%A, %B %d, %Y at %I:%M %p')}\nLocation: {event.location or 'No location specified'}\n" for event in events])
-        await ctx.send(f"**Upcoming Events for {guild.name}:**\n{event_list}")
+        # Rendered pages are reused until this guild's events change
+        filters = (first_date, last_date, location)
+        version = event_cache.version(guild.id)
+        pages = page_cache.get(guild.id, filters, version)
+        if pages is None:
+            with stats.time("get_events", "merge"):
+                pages = event_pages.render_pages(events, guild_timezones.get(guild.id), first_date, last_date, location)
+            page_cache.put(guild.id, filters, version, pages)
+
+        if not pages:
+            await ctx.send("No events match those filters.")
+            return
+
+        # Send the first page, with buttons to flip through the rest
+        title = f"Upcoming Events for {guild.name}"
+        with stats.time("get_events", "reply"):
+            if len(pages) == 1:
+                await ctx.send(embed=event_pages.page_embed(title, pages, 0))
+            else:
+                await ctx.send(embed=event_pages.page_embed(title, pages, 0), view=event_pages.EventPagesView(title, pages))
     
     except discord.Forbidden:
         await ctx.send("I don't have permission to view events for this guild.")
@@ -168,6 +326,7 @@ async def get_events(ctx):
 
     
 @bot.command(name="schedule_event")
+@timed_command(stats, "schedule_event")
 async def schedule_event(ctx, *, arg):
     guild = ctx.guild  # Access the guild (server) where the command is invoked
     if not guild:
@@ -176,34 +335,47 @@ async def schedule_event(ctx, *, arg):
 
     try:
         # Parse event data using your custom parser
-        event_data = user_message_parser.get_event_parameters_from_GT(arg)
-
-        # Convert ISO 8601 strings to timezone-aware datetime objects
-        start_time = datetime.fromisoformat(event_data["start_time"])
-        end_time = datetime.fromisoformat(event_data["end_time"])
+        with stats.time("schedule_event", "parse"):
+            if dedup_index.seen(guild.id, text_key(arg)):
+                await ctx.send("I already have this booking, so there's nothing to change.")
+                return
+            booking = user_message_parser.parse_booking(arg, guild_timezones.get(guild.id))
+            if dedup_index.seen(guild.id, booking_key(booking)):
+                await ctx.send("I already have this booking, so there's nothing to change.")
+                return
 
         entity_type = EntityType.external
         privacy_level = PrivacyLevel.guild_only
         # Create the scheduled event
-        scheduled_event = await guild.create_scheduled_event(
-            name=event_data["event_name"],
-            description=event_data["description"],
-            start_time=start_time,
-            end_time=end_time,
-            entity_type=entity_type,
-            privacy_level=privacy_level,
-            location=event_data["location"]  # Required for external events
-        )
+        with stats.time("schedule_event", "write"):
+            scheduled_event = await guild.create_scheduled_event(
+                name=booking.event_name,
+                description=user_message_parser.SlotSet([booking.slot]).serialize(),
+                start_time=booking.start_utc,
+                end_time=booking.end_utc,
+                entity_type=entity_type,
+                privacy_level=privacy_level,
+                location=booking.location  # Required for external events
+            )
+        with stats.time("schedule_event", "merge"):
+            event_cache.upsert(scheduled_event)
+            booking_store.record_slots(guild.id, scheduled_event.id, booking.location, booking.start_time.date(), [booking.slot], booking.event_name)
+            dedup_index.remember(guild.id, [text_key(arg), booking_key(booking)], booking, scheduled_event.id)
+            warnings = conflict_warnings(guild, [(booking.location, booking.start_time.date(), booking.slot)])
 
         # Send a success message
-        await ctx.send(f"Scheduled Event Created: {scheduled_event.name}\nURL: {scheduled_event.url}")
+        with stats.time("schedule_event", "reply"):
+            await ctx.send("\n".join([f"Scheduled Event Created: {scheduled_event.name}\nURL: {scheduled_event.url}"] + warnings)[:2000])
 
     except discord.Forbidden:
         await ctx.send("I don't have permission to manage events.")
     except discord.HTTPException as e:
         await ctx.send(f"Failed to create event: {e}")
+    except ValueError:
+        await ctx.send("I couldn't read that confirmation. It needs a date, a time, a room and a check-in code.")
 
 @bot.command(name="update_event")
+@timed_command(stats, "update_event")
 async def update_event(ctx, *, arg):
     guild = ctx.guild  # Access the guild (server) where the command is invoked
     if not guild:
@@ -212,94 +384,630 @@ async def update_event(ctx, *, arg):
 
     try:
         # Get the event to update and updated event data
-        result = await get_event_to_update(ctx, user_message_parser.get_event_parameters_from_GT(arg))
+        with stats.time("update_event", "parse"):
+            # A repeat of a confirmation that was already merged would only rewrite the same description
+            if dedup_index.seen(guild.id, text_key(arg)):
+                await ctx.send("I already have this booking, so there's nothing to change.")
+                return
+            booking = user_message_parser.parse_booking(arg, guild_timezones.get(guild.id))
+            if dedup_index.seen(guild.id, booking_key(booking)):
+                await ctx.send("I already have this booking, so there's nothing to change.")
+                return
+        result = await get_event_to_update(ctx, booking)
         if result is None:
             await ctx.send("I found no event to update. To update the time of an event, the time must come directly after or before the original time.")
             return
         
         current_event, updated_event_data = result
 
-        # Extract the date from the current event's start_time
-        current_event_date = current_event.start_time.date()
+        # Read-merge-write under the event's lock so concurrent bookings can't overwrite each other.
+        # The lock only covers recording the booking and queueing the edit; the store is what the next holder builds on.
+        async with event_locks.hold((guild.id, current_event.id)):
+            # The event may have changed while we waited for the lock
+            current_event = event_cache.get_cached(guild.id, current_event.id) or current_event
+            # Record the new booking and render the description from everything the store has for this event
+            with stats.time("update_event", "merge"):
+                event_slots(guild, current_event)
+                booking_store.record_slots(guild.id, current_event.id, current_event.location, local_event_date(guild, current_event.start_time), [booking.slot], booking.event_name)
+                slot_set = booking_store.slots_for_event(guild.id, current_event.id)
+                sorted_description = slot_set.serialize()
+                warnings = conflict_warnings(guild, [(current_event.location, local_event_date(guild, current_event.start_time), booking.slot)])
+            log(logging.DEBUG, "update_event merged", guild=guild.id, event=current_event.id, slots=len(slot_set))
+
+            # check if only the description needs updating
+            if "description" in updated_event_data and len(updated_event_data) == 1:
+                edit = write_queue.submit(current_event, description=sorted_description)
+                reply = f'Event description updated: \n{sorted_description}. \nTo update the discord event time, make sure there are no gaps in your booking!'
+            else:
+                # if no gaps exist in the description, parse the times and update the Discord event
+                event_times = event_times_from_slots(guild, slot_set, local_event_date(guild, current_event.start_time))
+                if not event_times:
+                    await ctx.send("Could not determine the largest continuous interval.")
+                    return
+
+                earliest_start_utc, latest_end_utc, earliest_start_minute, latest_end_minute = event_times
+
+                # Determine if we need to update the event time
+                if slot_set.find_gap():
+                    edit = write_queue.submit(current_event, description=sorted_description)
+                    reply = f'Event description updated with sorted times: \n{sorted_description} Discord event time remains unchanged due to a gap.'
+                else:
+                    edit = write_queue.submit(
+                        current_event,
+                        start_time=earliest_start_utc,
+                        end_time=latest_end_utc,
+                        description=sorted_description
+                    )
+                    reply = f"Scheduled Event Updated: {current_event.name}\nURL: {current_event.url}\nUpdated Time: {format_clock(earliest_start_minute)} - {format_clock(latest_end_minute)}"
+
+        with stats.time("update_event", "write"):
+            await edit
+        dedup_index.remember(guild.id, [text_key(arg), booking_key(booking)], booking, current_event.id)
+        with stats.time("update_event", "reply"):
+            await ctx.send("\n".join([reply] + warnings)[:2000])
 
-        # print("current event:", current_event, current_event_date)
-        # print("updated event data", updated_event_data)
-        updated_description = f'{current_event.description}\n{updated_event_data["description"]}'
-
-        # print("new description to add", updated_description)
-        sorted_description = user_message_parser.sort_event_description(updated_description)
-        # print("sorted_description",sorted_description)
-        # check if only the description needs updating
-        if "description" in updated_event_data and len(updated_event_data) == 1:
-            await current_event.edit(description=sorted_description)
-            await ctx.send(f'Event description updated: \n{sorted_description}. \nTo update the discord event time, make sure there are no gaps in your booking!')
-            return
-        
+    except discord.Forbidden:
+        await ctx.send("I don't have permission to manage events.")
+    except discord.HTTPException as e:
+        await ctx.send(f"Failed to update event: {e}")
+    except ValueError:
+        await ctx.send("I couldn't read that confirmation. It needs a date, a time, a room and a check-in code.")
 
-        # if no gaps exist in the description, parse the times and update the Discord event
+@bot.command(name="batch_import")
+@timed_command(stats, "batch_import")
+async def batch_import(ctx, *, arg=""):
+    guild = ctx.guild  # Access the guild (server) where the command is invoked
+    if not guild:
+        await ctx.send("This command can only be used in a guild.")
+        return
 
-        print("sorted_description", sorted_description)
+    with stats.time("batch_import", "fetch"):
+        event_index = await event_cache.get_index(guild)
+
+    # Bookings grouped by (location, local date), so each event gets one create or edit
+    groups = {}
+    dedup_keys = {}  # booking_key -> keys to remember once the booking has been written
+    duplicates = 0
+
+    # Collect the pasted text plus any .txt/.eml/.mbox attachments. Mailboxes and other big files are
+    # streamed: downloaded and split a chunk at a time, so their text is never held in memory, and their
+    # confirmations are parsed in batches through the parse pool so a whole mailbox doesn't stall the event loop.
+    # The bookings themselves are grouped as they arrive and kept until every event is written (each
+    # event's merge needs all of its bookings), so memory grows with the number of bookings, not the file size
+    texts = [arg]
+    seen_codes = set()
+    stream = mail_stream.ConfirmationStream(guild_timezones.get(guild.id), seen_codes)
+    unparsed = []
+
+    async def parse_streamed():
+        nonlocal duplicates
+        bookings = await parse_pool.parse_confirmations(unparsed, guild_timezones.get(guild.id))
+        unparsed.clear()
+        for booking in bookings:
+            booking = stream.accept(booking)
+            if booking is None:
+                continue
+            if dedup_index.seen(guild.id, booking_key(booking)):
+                duplicates += 1
+                continue
+            groups.setdefault(event_index.key_for(booking.location, booking.start_time), []).append(booking)
+
+    with stats.time("batch_import", "read"):
+        for attachment in ctx.message.attachments:
+            if mail_stream.should_stream(attachment.filename, attachment.size):
+                async for chunk in mail_stream.attachment_chunks(attachment):
+                    unparsed.extend(stream.confirmations(chunk))
+                    if len(unparsed) >= mail_stream.PARSE_BATCH:
+                        await parse_streamed()
+                unparsed.extend(stream.end_confirmations())
+                await parse_streamed()
+                continue
+            text = user_message_parser.text_from_attachment(attachment.filename, await attachment.read())
+            if text:
+                texts.append(text)
+
+    confirmations = [confirmation for text in texts for confirmation in user_message_parser.split_confirmations(text)]
+    if not confirmations and not groups and not stream.failed and not stream.duplicates and not duplicates:
+        await ctx.send("I found no booking confirmations to import.")
+        return
 
-        # Parse time slots from the sorted description
-        time_slots = user_message_parser.parse_event_times_from_description(sorted_description)
-        if not time_slots:
-            # print("time_slots is None")
+    # Parse every pasted confirmation into the same groups
+    failed = stream.failed
+    duplicates += stream.duplicates
+    with stats.time("batch_import", "parse"):
+        # Confirmations this guild already applied are dropped before they are even parsed
+        fresh = []
+        for confirmation in confirmations:
+            if dedup_index.seen(guild.id, text_key(confirmation)):
+                duplicates += 1
+            else:
+                fresh.append(confirmation)
+        # Large pastes are parsed in the process pool so they don't stall the event loop
+        pasted = await parse_pool.parse_confirmations(fresh, guild_timezones.get(guild.id))
+        for confirmation, booking in zip(fresh, pasted):
+            if booking is None:
+                failed += 1
+                continue
+            # The same confirmation pasted twice (or also in an attachment, or in an earlier import) only counts once
+            if booking.checkin_code is not None:
+                if booking_key(booking) in seen_codes or dedup_index.seen(guild.id, booking_key(booking)):
+                    duplicates += 1
+                    continue
+                seen_codes.add(booking_key(booking))
+            dedup_keys[booking_key(booking)] = [text_key(confirmation), booking_key(booking)]
+            key = event_index.key_for(booking.location, booking.start_time)
+            groups.setdefault(key, []).append(booking)
+
+    def remember_applied(bookings, event_id):
+        for booking in bookings:
+            dedup_index.remember(guild.id, dedup_keys.get(booking_key(booking), [booking_key(booking)]), booking, event_id)
+
+    # Merge each group in memory and make one Discord call per event
+    created = 0
+    updated = 0
+    summary_lines = []
+    queued_edits = []
+    recorded = []  # (location, local date, slot) of every booking stored, for the conflict check
+    # Earlier dates first, so bookings just after midnight find the event their previous night's group created
+    for key, bookings in sorted(groups.items(), key=lambda item: item[0][1]):
+        event_date = key[1]
+        first_booking = bookings[0]
+        group_start = min(booking.start_utc for booking in bookings)
+        group_end = max(booking.end_utc for booking in bookings)
+
+        try:
+            # Hold the (location, date) lock while deciding between create and edit, so two imports can't both create
+            async with event_locks.hold((guild.id, key)):
+                match = event_index.find_match(first_booking.location, group_start, group_end)
+                if match is None:
+                    slot_set = user_message_parser.SlotSet([booking.slot for booking in bookings])
+                    sorted_description = slot_set.serialize()
+                    event_times = event_times_from_slots(guild, slot_set, event_date)
+                    start_time, end_time = event_times[:2] if event_times else (group_start, group_end)
+                    scheduled_event = await guild.create_scheduled_event(
+                        name=first_booking.event_name,
+                        description=sorted_description,
+                        start_time=start_time,
+                        end_time=end_time,
+                        entity_type=EntityType.external,
+                        privacy_level=PrivacyLevel.guild_only,
+                        location=first_booking.location
+                    )
+                    event_cache.upsert(scheduled_event)
+                    record_bookings(guild, scheduled_event.id, first_booking.location, event_date, bookings)
+                    recorded.extend((first_booking.location, event_date, booking.slot) for booking in bookings)
+                    remember_applied(bookings, scheduled_event.id)
+                    created += 1
+                    summary_lines.append(f"Created {scheduled_event.name} ({first_booking.location}, {event_date}): {len(bookings)} booking(s)")
+                    continue
+
+                current_event, _ = match
+                async with event_locks.hold((guild.id, current_event.id)):
+                    event_slots(guild, current_event)
+                    record_bookings(guild, current_event.id, current_event.location, local_event_date(guild, current_event.start_time), bookings)
+                    recorded.extend((current_event.location, local_event_date(guild, current_event.start_time), booking.slot) for booking in bookings)
+                    slot_set = booking_store.slots_for_event(guild.id, current_event.id)
+                    edit_fields = {"description": slot_set.serialize()}
+                    # Only move the Discord event time when the merged bookings are continuous
+                    if not slot_set.find_gap():
+                        event_times = event_times_from_slots(guild, slot_set, local_event_date(guild, current_event.start_time))
+                        if event_times:
+                            edit_fields["start_time"], edit_fields["end_time"] = event_times[:2]
+                    # Queue the edit and keep going, so every event's PATCH goes out in the same window
+                    queued_edits.append((current_event, first_booking.location, event_date, bookings, write_queue.submit(current_event, **edit_fields)))
+        except discord.Forbidden:
+            await ctx.send("I don't have permission to manage events.")
             return
-
-        # Find the largest continuous interval
-        largest_interval = user_message_parser.find_largest_continuous_interval(time_slots)
-        if not largest_interval:
-            await ctx.send("Could not determine the largest continuous interval.")
+        except discord.HTTPException as e:
+            summary_lines.append(f"Failed {first_booking.location} on {event_date}: {e}")
+
+    with stats.time("batch_import", "write"):
+        results = await asyncio.gather(*(future for *_, future in queued_edits), return_exceptions=True)
+    for (current_event, location, event_date, bookings, _), result in zip(queued_edits, results):
+        if isinstance(result, discord.Forbidden):
+            await ctx.send("I don't have permission to manage events.")
             return
+        if isinstance(result, discord.HTTPException):
+            summary_lines.append(f"Failed {location} on {event_date}: {result}")
+            continue
+        if isinstance(result, BaseException):
+            raise result
+        updated += 1
+        remember_applied(bookings, current_event.id)
+        summary_lines.append(f"Updated {current_event.name} ({location}, {event_date}): {len(bookings)} booking(s)")
+
+    summary_lines.extend(conflict_warnings(guild, recorded))
+    parsed = sum(len(bookings) for bookings in groups.values())
+    summary = f"Batch import: {parsed} booking(s) parsed, {failed} failed, {duplicates} duplicate(s) skipped. Created {created} event(s), updated {updated}.\n"
+    if stream.bytes_read:
+        summary += f"Streamed {stream.bytes_read / 1e6:.1f} MB of attachments: {stream.bookings} booking(s) at {stream.rate():.0f} bookings/s\n"
+    summary += "\n".join(summary_lines)
+    # Stay under Discord's message length limit
+    if len(summary) > 2000:
+        summary = summary[:1997] + "..."
+    with stats.time("batch_import", "reply"):
+        await ctx.send(summary)
+
+@bot.command(name="schedule_recurring")
+@timed_command(stats, "schedule_recurring")
+async def schedule_recurring(ctx, *, arg):
+    guild = ctx.guild  # Access the guild (server) where the command is invoked
+    if not guild:
+        await ctx.send("This command can only be used in a guild.")
+        return
 
-        earliest_start_time, latest_end_time = largest_interval
+    local_tz = guild_timezones.get(guild.id)
+    try:
+        with stats.time("schedule_recurring", "parse"):
+            weekly = recurrence.parse_recurrence(arg, datetime.now(local_tz).date())
+    except ValueError as e:
+        await ctx.send(f'{e}. Example: <3schedule_recurring "STUDY SLAY" every Sunday 6-8pm in Price Gilbert 2216 until Dec 15')
+        return
 
-        # Handle timezone and date localization
-        local_tz = pytz.timezone("America/New_York")
-        earliest_start_date = current_event.start_time.date()
-        latest_end_date = current_event.start_time.date()
+    with stats.time("schedule_recurring", "fetch"):
+        event_index = await event_cache.get_index(guild)
+
+    # One status message, edited as the events go out
+    status = await ctx.send(f"Scheduling {weekly.describe()}...")
+    already_scheduled = []
+
+    def missing_occurrences():
+        # Same (location, date) match update_event uses, so weeks that already have an event there are left alone
+        for booking in weekly.occurrences(local_tz):
+            if event_index.find_match(booking.location, booking.start_utc, booking.end_utc) is None:
+                yield booking
+            else:
+                already_scheduled.append(booking)
+
+    async def create_occurrence(booking):
+        # Re-check under the (location, date) lock in case another command created it in the meantime
+        async with event_locks.hold((guild.id, event_index.key_for(booking.location, booking.start_time))):
+            if event_index.find_match(booking.location, booking.start_utc, booking.end_utc) is not None:
+                already_scheduled.append(booking)
+                return None
+            scheduled_event = await guild.create_scheduled_event(
+                name=booking.event_name,
+                description=user_message_parser.SlotSet([booking.slot]).serialize(),
+                start_time=booking.start_utc,
+                end_time=booking.end_utc,
+                entity_type=EntityType.external,
+                privacy_level=PrivacyLevel.guild_only,
+                location=booking.location
+            )
+            event_cache.upsert(scheduled_event)
+            booking_store.record_slots(guild.id, scheduled_event.id, booking.location, booking.start_time.date(), [booking.slot], booking.event_name)
+            return scheduled_event
+
+    def progress_text(results, done=False):
+        # Each result is the created event, None (someone else created it first) or the HTTPException
+        failed = [booking for booking, result in results if isinstance(result, Exception)]
+        created = sum(1 for _, result in results if result is not None) - len(failed)
+        text = (f"{'Scheduled' if done else 'Scheduling'} {weekly.describe()}\n"
+                f"Created {created} event(s), {len(already_scheduled)} already scheduled, {len(failed)} failed.")
+        if done and failed:
+            text += "\nFailed: " + ", ".join(str(booking.start_time.date()) for booking in failed)
+        return text[:2000]
+
+    async def show_progress(results):
+        if status is not None:
+            await status.edit(content=progress_text(results))
 
-        # Adjust dates if the event spans past midnight
-        if latest_end_time < earliest_start_time:
-            latest_end_date += timedelta(days=1)  # End time is on the next day
+    try:
+        with stats.time("schedule_recurring", "write"):
+            results = await run_throttled(missing_occurrences(), create_occurrence, on_progress=show_progress)
+    except discord.Forbidden:
+        await ctx.send("I don't have permission to manage events.")
+        return
 
-        # Combine the date and time
-        earliest_start_datetime = datetime.combine(earliest_start_date, earliest_start_time.time())
-        latest_end_datetime = datetime.combine(latest_end_date, latest_end_time.time())
+    with stats.time("schedule_recurring", "reply"):
+        if status is not None:
+            await status.edit(content=progress_text(results, done=True))
+        else:
+            await ctx.send(progress_text(results, done=True))
 
-        # Localize to the event's timezone
-        earliest_start_localized = local_tz.localize(earliest_start_datetime)
-        latest_end_localized = local_tz.localize(latest_end_datetime)
+# Auto-ingest: watch opted-in channels for pasted confirmations
+async def ingest_confirmations(channel, text, attachments):
+    # batch_import already decides between creating, extending and merging per (location, date)
+    await batch_import.callback(auto_ingest.ChannelContext(channel, attachments), arg=text)
 
-        # Convert localized times to UTC
-        earliest_start_utc = earliest_start_localized.astimezone(timezone.utc)
-        latest_end_utc = latest_end_localized.astimezone(timezone.utc)
+ingest_debouncer = auto_ingest.IngestDebouncer(ingest_confirmations)
 
-        # Determine if we need to update the event time
-        gap_in_description = user_message_parser.check_description_for_gaps(sorted_description)
-        if gap_in_description:
-            await current_event.edit(description=sorted_description)
-            await ctx.send(f'Event description updated with sorted times: \n{sorted_description} Discord event time remains unchanged due to a gap.')
-        else:
-            await current_event.edit(
-                start_time=earliest_start_utc,
-                end_time=latest_end_utc,
-                description=sorted_description
-            )
-            await ctx.send(f"Scheduled Event Updated: {current_event.name}\nURL: {current_event.url}\nUpdated Time: {earliest_start_time.strftime('%I:%M %p')} - {latest_end_time.strftime('%I:%M %p')}")
+@bot.listen("on_message")
+async def watch_for_confirmations(message):
+    # Without the message content intent every pasted message arrives empty
+    if not PREFIX_COMMANDS:
+        return
+    if message.author.bot or message.channel.id not in ingest_channels:
+        return
+    # Commands are handled by the command itself
+    if message.content.startswith(bot.command_prefix):
+        return
+    attachments = [attachment for attachment in message.attachments if attachment.filename.lower().endswith((".txt", ".eml"))]
+    if not attachments and not auto_ingest.looks_like_confirmation(message.content):
+        return
+    ingest_debouncer.add(message.channel, message.content, attachments)
 
-    except discord.Forbidden:
-        await ctx.send("I don't have permission to manage events.")
-    except discord.HTTPException as e:
-        await ctx.send(f"Failed to update event: {e}")
+@bot.command(name="auto_ingest")
+async def auto_ingest_command(ctx, setting=""):
+    guild = ctx.guild  # Access the guild (server) where the command is invoked
+    if not guild:
+        await ctx.send("This command can only be used in a guild.")
+        return
+    if setting.lower() not in ("on", "off"):
+        state = "on" if ctx.channel.id in ingest_channels else "off"
+        await ctx.send(f"Auto-ingest is {state} in this channel. Use <3auto_ingest on or <3auto_ingest off.")
+        return
+    if not ctx.author.guild_permissions.manage_events:
+        await ctx.send("You need the Manage Events permission to turn auto-ingest on or off.")
+        return
+    enabled = setting.lower() == "on"
+    if enabled and not PREFIX_COMMANDS:
+        await ctx.send("Auto-ingest needs to read pasted messages, which this bot can't do while PREFIX_COMMANDS=0. Use /batch_import instead.")
+        return
+    booking_store.set_ingest_channel(guild.id, ctx.channel.id, enabled)
+    if enabled:
+        ingest_channels.add(ctx.channel.id)
+        await ctx.send("Auto-ingest is on: paste confirmation emails here and I'll create or update the events myself.")
+    else:
+        ingest_channels.discard(ctx.channel.id)
+        await ctx.send("Auto-ingest is off for this channel.")
+
+# Slash commands: same logic as the prefix commands, but deferred so slow Discord calls don't time out
+@bot.tree.command(name="schedule", description="Create an event from a booking confirmation email")
+async def slash_schedule(interaction: discord.Interaction):
+    await interaction.response.send_modal(BookingModal("Schedule event", schedule_event.callback))
+
+@bot.tree.command(name="update", description="Add a booking confirmation email to its existing event")
+async def slash_update(interaction: discord.Interaction):
+    await interaction.response.send_modal(BookingModal("Update event", update_event.callback))
+
+@bot.tree.command(name="list", description="List this server's scheduled events")
+@discord.app_commands.describe(first_date="Only events on or after this date (YYYY-MM-DD)", last_date="Only events on or before this date (YYYY-MM-DD)", location="Only events whose location contains this")
+async def slash_list(interaction: discord.Interaction, first_date: str = None, last_date: str = None, location: str = None):
+    filters = {"from": first_date, "to": last_date, "location": location}
+    await run_deferred(interaction, get_events.callback, arg=" ".join(f"{name}:{value}" for name, value in filters.items() if value))
+
+@bot.tree.command(name="batch_import", description="Import many booking confirmations at once")
+@discord.app_commands.describe(attachment="A .txt or .eml file of confirmation emails (leave empty to paste them instead)")
+async def slash_batch_import(interaction: discord.Interaction, attachment: discord.Attachment = None):
+    if attachment is None:
+        await interaction.response.send_modal(BookingModal("Batch import", batch_import.callback))
+        return
+    await run_deferred(interaction, batch_import.callback, attachments=[attachment])
+
+@bot.tree.command(name="auto_ingest", description="Turn automatic import of pasted confirmations on or off in this channel")
+@discord.app_commands.describe(setting="on or off (leave empty to see the current setting)")
+@discord.app_commands.default_permissions(manage_events=True)
+@discord.app_commands.choices(setting=[discord.app_commands.Choice(name="on", value="on"), discord.app_commands.Choice(name="off", value="off")])
+async def slash_auto_ingest(interaction: discord.Interaction, setting: str = ""):
+    await run_deferred(interaction, auto_ingest_command.callback, setting=setting)
+
+@bot.event
+async def setup_hook():
+    # Register the slash commands with Discord (commands are global, so one shard process is enough)
+    if SHARD_IDS is None or 0 in SHARD_IDS:
+        await bot.tree.sync()
+
+async def warm_up_guild(guild, semaphore):
+    async with semaphore:
+        await event_cache.refresh(guild)
+        # One-time back-fill of the booking store from descriptions written before it existed
+        # (the lease keeps two processes from importing the same guild during a restart overlap)
+        if not booking_store.is_imported(guild.id) and booking_store.acquire_lease(f"import:{guild.id}", INSTANCE_ID, 300):
+            found = booking_store.import_events(guild.id, await event_cache.get_events(guild), guild_timezones.get(guild.id))
+            log(logging.INFO, "imported bookings into the booking store", guild=guild.id, bookings=found)
+
+
+async def warm_up_guilds(guilds):
+    # At most WARMUP_CONCURRENCY fetches in flight, so a bot in many guilds doesn't burst the REST rate limit
+    semaphore = asyncio.Semaphore(WARMUP_CONCURRENCY)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(warm_up_guild(guild, semaphore) for guild in guilds), return_exceptions=True)
+    for guild, result in zip(guilds, results):
+        if isinstance(result, Exception):
+            log(logging.WARNING, "guild warm-up failed", guild=guild.id, error=repr(result))
+    log(logging.INFO, "guilds warmed up", guilds=len(guilds), seconds=round(time.perf_counter() - started, 3))
+
+    if profile_startup:
+        startup.mark(f"warm up {len(guilds)} guild(s)")
+        print(startup.report())
+        await bot.close()
 
 # Event to confirm the bot is connected
 @bot.event
 async def on_ready():
-    print(f"Bot is connected as {bot.user} (ID: {bot.user.id})")
-    print("Connected to the following servers:")
-    for guild in bot.guilds:
-        print(f" - {guild.name} (ID: {guild.id})")
+    log(logging.INFO, "connected", user=str(bot.user), user_id=bot.user.id, guilds=len(bot.guilds))
+    if ingest_channels and not PREFIX_COMMANDS:
+        log(logging.WARNING, "auto-ingest channels are ignored while PREFIX_COMMANDS=0 (no message content intent)", channels=len(ingest_channels))
+    global stats_task, reconcile_task, warmup_task
+    if warmup_task is None:
+        startup.mark("log in and connect")
+    if STATS_PROM_PATH and stats_task is None:
+        stats_task = asyncio.ensure_future(dump_stats_periodically())
+    if reconcile_task is None:
+        reconcile_task = asyncio.ensure_future(reconciler.run(lambda: bot.guilds))
+    # on_ready also fires after a reconnect, where gateway events may have been missed
+    event_cache.mark_stale()
+    # Load the guilds in the background; a command for a guild that isn't loaded yet loads it itself
+    # (sharing the same fetch), so nothing waits for the whole warm-up
+    if warmup_task is not None:
+        warmup_task.cancel()
+    warmup_task = asyncio.ensure_future(warm_up_guilds(list(bot.guilds)))
+
+# Keep the event cache in sync with the gateway
+@bot.event
+async def on_scheduled_event_create(event):
+    event_cache.upsert(event)
+
+@bot.event
+async def on_scheduled_event_update(before, after):
+    event_cache.upsert(after)
+
+@bot.event
+async def on_scheduled_event_delete(event):
+    event_cache.remove(event)
+    booking_store.delete_event(event.guild_id, event.id)
+    dedup_index.forget_event(event.guild_id, event.id)
+
+@bot.event
+async def on_guild_join(guild):
+    await event_cache.refresh(guild)
+
+@bot.event
+async def on_guild_remove(guild):
+    event_cache.drop_guild(guild.id)
+    dedup_index.drop_guild(guild.id)
+
+@bot.command(name="set_timezone")
+async def set_timezone(ctx, name):
+    guild = ctx.guild  # Access the guild (server) where the command is invoked
+    if not guild:
+        await ctx.send("This command can only be used in a guild.")
+        return
+    # Changes how every event is filed and every later booking is read
+    if not ctx.author.guild_permissions.manage_events:
+        await ctx.send("You need the Manage Events permission to change this server's timezone.")
+        return
+    import pytz  # only for the exception type; resolving the name loads pytz anyway
+    try:
+        event_cache.set_timezone(guild.id, name)
+        booking_store.set_timezone(guild.id, name)
+    except pytz.UnknownTimeZoneError:
+        await ctx.send(f"I don't know the timezone {name}. Use a name like America/New_York.")
+        return
+    await ctx.send(f"Bookings in this server now use {name} time.")
+
+@bot.command(name="queue_stats")
+async def queue_stats(ctx):
+    stats = write_queue.stats()
+    await ctx.send(f"Write queue: {stats['depth']} pending, {stats['writes']} writes, {stats['coalesced']} edits coalesced, {stats['rate_limited']} rate limited\n"
+                   f"Latency: avg {stats['latency_avg'] * 1000:.0f}ms, max {stats['latency_max'] * 1000:.0f}ms")
+
+@bot.command(name="lock_stats")
+async def lock_stats(ctx):
+    stats = event_locks.stats()
+    await ctx.send(f"Event locks: {stats['held']} held, {stats['acquisitions']} acquisitions, {stats['contended']} had to wait\n"
+                   f"Wait: avg {stats['wait_avg'] * 1000:.1f}ms, max {stats['wait_max'] * 1000:.1f}ms")
+
+@bot.command(name="conflicts")
+@timed_command(stats, "conflicts")
+async def show_conflicts(ctx, first_date=None, last_date=None):
+    guild = ctx.guild  # Access the guild (server) where the command is invoked
+    if not guild:
+        await ctx.send("This command can only be used in a guild.")
+        return
+    try:
+        today = datetime.now(guild_timezones.get(guild.id)).date()
+        first = date.fromisoformat(first_date) if first_date else today
+        last = date.fromisoformat(last_date) if last_date else first + timedelta(days=30)
+    except ValueError:
+        await ctx.send("Dates look like 2024-11-17, e.g. <3conflicts 2024-11-01 2024-11-30")
+        return
+
+    with stats.time("conflicts", "fetch"):
+        # A day either side so overnight bookings at the edges of the range are placed correctly
+        rows = booking_store.bookings_between(guild.id, first - timedelta(days=1), last + timedelta(days=1))
+    with stats.time("conflicts", "match"):
+        found = [conflict for conflict in conflicts.find_conflicts(conflicts.slots_from_rows(rows))
+                 if first <= conflict.second.local_date <= last or first <= conflict.first.local_date <= last]
 
-# Run the bot
-bot.run(TOKEN)
+    if not found:
+        await ctx.send(f"No conflicts between {first} and {last}.")
+        return
+    report = f"{len(found)} conflict(s) between {first} and {last}:\n" + "\n".join(conflict.describe() for conflict in found)
+    # Stay under Discord's message length limit
+    if len(report) > 2000:
+        report = report[:1997] + "..."
+    await ctx.send(report)
+
+@bot.command(name="reconcile")
+async def reconcile(ctx):
+    guild = ctx.guild  # Access the guild (server) where the command is invoked
+    if not guild:
+        await ctx.send("This command can only be used in a guild.")
+        return
+    pruned, orphaned, archived, normalized = await reconciler.reconcile_guild(guild)
+    await ctx.send(f"Reconciled: {pruned} finished event(s) dropped from the cache, {orphaned} booking(s) of deleted events removed, "
+                   f"{archived} old booking(s) archived, {normalized} description(s) normalized.")
+
+@bot.command(name="reconcile_stats")
+async def reconcile_stats(ctx):
+    stats = reconciler.stats()
+    await ctx.send(f"Reconciler: {stats['ticks']} ticks, {stats['pruned']} pruned, {stats['orphaned']} orphaned, {stats['archived']} archived, {stats['normalized']} normalized\n"
+                   f"Last tick {stats['last_tick_seconds'] * 1000:.0f}ms, {stats['over_budget']} tick(s) ran out of budget")
+
+@bot.command(name="import_store")
+async def import_store(ctx):
+    guild = ctx.guild  # Access the guild (server) where the command is invoked
+    if not guild:
+        await ctx.send("This command can only be used in a guild.")
+        return
+    found = booking_store.import_events(guild.id, await event_cache.get_events(guild), guild_timezones.get(guild.id))
+    await ctx.send(f"Imported {found} booking(s) from this server's event descriptions.")
+
+def runtime_gauges():
+    # Cache/queue/lock numbers that sit alongside the stage timings in <3stats and the Prometheus dump
+    cache = event_cache.stats()
+    queue = write_queue.stats()
+    locks = event_locks.stats()
+    reconcile = reconciler.stats()
+    dedup = dedup_index.stats()
+    return {
+        "cache_events": cache["events"],
+        "cache_hits": cache["hits"],
+        "cache_misses": cache["misses"],
+        "write_queue_depth": queue["depth"],
+        "write_queue_coalesced": queue["coalesced"],
+        "locks_contended": locks["contended"],
+        "lock_wait_max_seconds": f"{locks['wait_max']:.6f}",
+        "dedup_entries": dedup["entries"],
+        "dedup_hits": dedup["hits"],
+        "reconcile_pruned": reconcile["pruned"],
+        "reconcile_normalized": reconcile["normalized"],
+        "reconcile_last_tick_seconds": f"{reconcile['last_tick_seconds']:.6f}",
+    }
+
+
+async def dump_stats_periodically(interval=60):
+    while True:
+        stats.dump_prometheus(STATS_PROM_PATH, runtime_gauges())
+        await asyncio.sleep(interval)
+
+
+@bot.command(name="stats")
+async def show_stats(ctx):
+    lines = ["**Command timings (count, p50, p99)**"]
+    for (command, stage), (count, p50, p99) in sorted(stats.summary().items()):
+        lines.append(f"{command}.{stage}: {count}, {p50 * 1000:.1f}ms, {p99 * 1000:.1f}ms")
+    if ctx.guild:
+        lines.append("**This server**")
+        for command, (count, p50, p99) in sorted(stats.guild_summary(ctx.guild.id).items()):
+            lines.append(f"{command}: {count}, {p50 * 1000:.1f}ms, {p99 * 1000:.1f}ms")
+    lines.append(" ".join(f"{name}={value}" for name, value in runtime_gauges().items()))
+    stats.dump_prometheus(STATS_PROM_PATH, runtime_gauges())
+    message = "\n".join(lines)
+    # Stay under Discord's message length limit
+    await ctx.send(message if len(message) <= 2000 else message[:1997] + "...")
+
+@bot.command(name="cache_stats")
+async def cache_stats(ctx):
+    stats = event_cache.stats()
+    await ctx.send(f"Event cache: {stats['guilds']} guilds, {stats['events']} events, {stats['stale']} stale\n"
+                   f"Hits: {stats['hits']} Misses: {stats['misses']} (hit rate {stats['hit_rate']:.0%})")
+    dedup = dedup_index.stats()
+    await ctx.send(f"Dedup index: {dedup['entries']} entries, {dedup['hits']} repeats skipped, {dedup['evicted']} evicted")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Event Scheduler Slay Discord bot")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print how long each startup phase took once every guild is warmed up, then exit")
+    args = parser.parse_args(argv)
+
+    global profile_startup
+    profile_startup = args.profile_startup
+    startup.mark("register commands")
+    setup_logging()
+    try:
+        bot.run(TOKEN, log_handler=None)  # discord.py logs through our logging setup
+    finally:
+        parse_pool.shutdown()
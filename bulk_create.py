@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import discord
+
+
+'''
+
+Throttled pipeline for making many Discord calls in a row (e.g. one create_scheduled_event per week
+of a recurring booking).
+
+Items are pulled lazily from an iterator by a small, fixed number of workers, so at most `concurrency`
+calls are in flight and nothing is expanded ahead of what is being sent. A 429 that discord.py hands
+back is waited out and retried, and on_progress is called at most every `progress_interval` seconds
+(plus once at the end) so a status message can be edited instead of sending one reply per item.
+
+'''
+
+
+async def call_with_retry(call, max_retries=3):
+    for attempt in range(max_retries + 1):
+        try:
+            return await call()
+        except discord.HTTPException as e:
+            if e.status != 429 or attempt == max_retries:
+                raise
+            await asyncio.sleep(getattr(e, "retry_after", None) or 1.0)
+
+
+async def run_throttled(items, worker, concurrency=2, on_progress=None, progress_interval=2.0, max_retries=3):
+    '''
+
+    Runs worker(item) for every item, at most `concurrency` at a time.
+    Returns [(item, result or exception)] in completion order; on_progress(results) is awaited as results come in
+
+    '''
+    items = iter(items)
+    results = []
+    last_progress = time.perf_counter()
+
+    async def run_worker():
+        nonlocal last_progress
+        # Each worker takes the next item only when it is free, which is what keeps the expansion lazy
+        for item in items:
+            try:
+                result = await call_with_retry(lambda: worker(item), max_retries)
+            except discord.Forbidden:
+                raise
+            except discord.HTTPException as e:
+                result = e
+            results.append((item, result))
+            if on_progress and time.perf_counter() - last_progress >= progress_interval:
+                last_progress = time.perf_counter()
+                await on_progress(results)
+
+    await asyncio.gather(*(run_worker() for _ in range(concurrency)))
+    if on_progress:
+        await on_progress(results)
+    return results
@@ -0,0 +1,125 @@
+import heapq
+from dataclasses import dataclass
+from datetime import date
+
+from time_tokens import MINUTES_PER_DAY, format_clock
+from user_message_parser import unwrap_midnight
+
+
+'''
+
+Double-booking detection over the booking store's rows.
+
+Two kinds of overlap are reported:
+  room   the same room booked by two different groups at the same time
+  group  the same group (event name) holding two different rooms at the same time
+
+Both are found with a sweep line: bookings are partitioned by room (or by group), each partition is
+sorted by start time, and a heap of the bookings still running is swept forward, so a guild's bookings
+are checked in O(n log n + conflicts) rather than pairwise.
+
+'''
+
+
+@dataclass(slots=True, frozen=True)
+class Slot:
+    '''
+
+    One stored booking placed on an absolute minute timeline (minutes since date.min)
+
+    '''
+    location: str
+    local_date: date
+    start: int
+    end: int
+    checkin_code: str
+    event_name: str
+
+    @property
+    def group(self):
+        return (self.event_name or "").lower()
+
+    def describe(self):
+        return (f"{self.event_name or 'unknown group'} in {self.location} on {date.fromordinal(self.start // MINUTES_PER_DAY)}, "
+                f"{format_clock(self.start % MINUTES_PER_DAY)} - {format_clock(self.end % MINUTES_PER_DAY)} ({self.checkin_code})")
+
+
+@dataclass(slots=True, frozen=True)
+class Conflict:
+    kind: str  # "room" or "group"
+    first: Slot
+    second: Slot
+
+    def describe(self):
+        if self.kind == "room":
+            return f"Room double-booked: {self.first.describe()} overlaps {self.second.describe()}"
+        return f"Group in two rooms: {self.first.describe()} overlaps {self.second.describe()}"
+
+
+def slots_from_rows(rows):
+    '''
+
+    Turns booking_store.bookings_between rows into Slots. Slots that continue a night past midnight
+    are stored under the night's date with time-of-day minutes, so each (room, date) is unwrapped first
+
+    '''
+    per_day = {}
+    for location, local_date, start, end, code, name in rows:
+        per_day.setdefault((location, local_date), []).append((start, end, code, name))
+    slots = []
+    for (location, local_date), day_slots in per_day.items():
+        day_start = local_date.toordinal() * MINUTES_PER_DAY
+        for start, end, code, name in unwrap_midnight(sorted(day_slots)):
+            slots.append(Slot(location, local_date, day_start + start, day_start + end, code, name))
+    return slots
+
+
+def _sweep(slots, clashes):
+    # slots all share one partition key; reports every overlapping pair for which clashes(a, b) is true
+    found = []
+    running = []  # heap of (end, order, slot)
+    for order, slot in enumerate(sorted(slots, key=lambda slot: (slot.start, slot.end))):
+        # Anything that ended by now can't overlap this or any later slot (touching isn't overlapping)
+        while running and running[0][0] <= slot.start:
+            heapq.heappop(running)
+        for _, _, other in running:
+            if clashes(other, slot):
+                found.append((other, slot))
+        heapq.heappush(running, (slot.end, order, slot))
+    return found
+
+
+def find_conflicts(slots):
+    '''
+
+    Returns every room and group Conflict among the slots, ordered by start time
+
+    '''
+    by_room = {}
+    by_group = {}
+    for slot in slots:
+        by_room.setdefault(slot.location, []).append(slot)
+        if slot.group:
+            by_group.setdefault(slot.group, []).append(slot)
+
+    conflicts = []
+    for room_slots in by_room.values():
+        conflicts.extend(Conflict("room", first, second) for first, second in
+                         _sweep(room_slots, lambda first, second: first.group != second.group))
+    for group_slots in by_group.values():
+        conflicts.extend(Conflict("group", first, second) for first, second in
+                         _sweep(group_slots, lambda first, second: first.location != second.location))
+    conflicts.sort(key=lambda conflict: (conflict.second.start, conflict.kind))
+    return conflicts
+
+
+def conflicts_for(slots, recorded):
+    '''
+
+    The conflicts that involve any of the just-recorded bookings, given as (location, event's local date, time-of-day slot)
+
+    '''
+    keys = {(location.lower(), local_date, start % MINUTES_PER_DAY, code) for location, local_date, (start, end, code) in recorded}
+    return [conflict for conflict in find_conflicts(slots)
+            if any((candidate.location, candidate.local_date, candidate.start % MINUTES_PER_DAY, candidate.checkin_code) in keys
+                   for candidate in (conflict.first, conflict.second))]
@@ -0,0 +1,95 @@
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+'''
+
+Remembers the confirmations each guild has already applied, so pasting the same one again is answered
+straight away: no merge, no store write and no Discord call.
+
+Two kinds of key point at the same entry:
+  the exact pasted text (a digest), checked before the text is even parsed
+  the booking itself (check-in code, room and slot), for the same booking pasted with different whitespace
+
+Entries expire when the booking's event ends (nothing can be merged into it after that) and each guild
+keeps at most max_entries, dropping the least recently used first.
+
+'''
+
+
+def text_key(text):
+    return ("text", hashlib.blake2b(text.strip().encode(), digest_size=16).digest())
+
+
+def booking_key(booking):
+    return ("booking", booking.checkin_code, (booking.location or "").lower(), booking.start_utc, booking.end_utc)
+
+
+class DedupIndex:
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._guilds = {}  # guild_id -> OrderedDict of key -> (expires_at, event_id)
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def seen(self, guild_id, key, now=None):
+        '''
+
+        True if key was applied in this guild and its event hasn't ended yet
+
+        '''
+        entries = self._guilds.get(guild_id)
+        entry = entries.get(key) if entries else None
+        if entry is None:
+            self.misses += 1
+            return False
+        if entry[0] <= (now or datetime.now(timezone.utc)):
+            del entries[key]
+            self.misses += 1
+            return False
+        entries.move_to_end(key)
+        self.hits += 1
+        return True
+
+    def remember(self, guild_id, keys, booking, event_id=None, now=None):
+        '''
+
+        Records keys (text_key/booking_key) as applied until the booking's event ends
+
+        '''
+        entries = self._guilds.setdefault(guild_id, OrderedDict())
+        for key in keys:
+            entries[key] = (booking.end_utc, event_id)
+            entries.move_to_end(key)
+        if len(entries) > self.max_entries:
+            self._evict(entries, now or datetime.now(timezone.utc))
+
+    def _evict(self, entries, now):
+        # Expired entries go first; only then the least recently used
+        for key in [key for key, (expires_at, _) in entries.items() if expires_at <= now]:
+            del entries[key]
+            self.evicted += 1
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evicted += 1
+
+    def forget_event(self, guild_id, event_id):
+        # The event was deleted, so its bookings may legitimately be submitted again
+        entries = self._guilds.get(guild_id)
+        if entries:
+            for key in [key for key, (_, entry_event_id) in entries.items() if entry_event_id == event_id]:
+                del entries[key]
+
+    def drop_guild(self, guild_id):
+        self._guilds.pop(guild_id, None)
+
+    def stats(self):
+        return {
+            "entries": sum(len(entries) for entries in self._guilds.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+        }
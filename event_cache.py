@@ -0,0 +1,148 @@
+import asyncio
+
+from event_index import EventIndex
+
+
+class EventCache:
+    '''
+
+    Per-guild in-memory store of scheduled events.
+
+    Filled once per guild (on_ready / first use) with a REST fetch and then kept
+    current from the on_scheduled_event_create/update/delete gateway events.
+    Only goes back to REST when a guild is cold or has been flagged stale.
+    Each guild also gets an EventIndex for (location, date) lookups.
+
+    '''
+
+    def __init__(self, guild_timezones):
+        # GuildTimezones, so each guild's index files events under that guild's local dates
+        self.guild_timezones = guild_timezones
+        # guild_id -> {event_id: ScheduledEvent}
+        self._events = {}
+        # guild_id -> EventIndex over the same events
+        self._indexes = {}
+        # guilds whose contents can no longer be trusted (missed gateway events, etc.)
+        self._stale = set()
+        # guild_id -> in-flight fetch task so concurrent cold reads share one REST call
+        self._fetching = {}
+        # guild_id -> counter bumped on every change, so anything derived from a guild's events can tell it's outdated
+        self._versions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def is_warm(self, guild_id):
+        return guild_id in self._events and guild_id not in self._stale
+
+    async def get_events(self, guild):
+        '''
+
+        Returns a list of the guild's scheduled events, hitting REST only if the guild is cold or stale
+
+        '''
+        if self.is_warm(guild.id):
+            self.hits += 1
+            return list(self._events[guild.id].values())
+
+        self.misses += 1
+        await self.refresh(guild)
+        return list(self._events.get(guild.id, {}).values())
+
+    def get_cached(self, guild_id, event_id):
+        # Latest copy we hold of one event, without ever going to REST
+        return self._events.get(guild_id, {}).get(event_id)
+
+    async def get_index(self, guild):
+        '''
+
+        Returns the guild's EventIndex, loading the guild first if it is cold or stale
+
+        '''
+        if self.is_warm(guild.id):
+            self.hits += 1
+        else:
+            self.misses += 1
+            await self.refresh(guild)
+        return self._indexes[guild.id]
+
+    async def refresh(self, guild):
+        # Share a single fetch between everyone asking for the same guild at once
+        task = self._fetching.get(guild.id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(guild))
+            self._fetching[guild.id] = task
+            task.add_done_callback(lambda _: self._fetching.pop(guild.id, None))
+        await task
+
+    async def _fetch(self, guild):
+        events = await guild.fetch_scheduled_events()
+        self._events[guild.id] = {event.id: event for event in events}
+        index = EventIndex(self.guild_timezones.get(guild.id))
+        index.rebuild(events)
+        self._indexes[guild.id] = index
+        self._stale.discard(guild.id)
+        self._bump(guild.id)
+
+    def upsert(self, event):
+        # Only track guilds we've loaded, otherwise a partial store would look warm
+        guild_events = self._events.get(event.guild_id)
+        if guild_events is not None:
+            guild_events[event.id] = event
+            self._indexes[event.guild_id].add(event)
+            self._bump(event.guild_id)
+
+    def remove(self, event):
+        guild_events = self._events.get(event.guild_id)
+        if guild_events is not None:
+            guild_events.pop(event.id, None)
+            self._indexes[event.guild_id].remove(event.id)
+            self._bump(event.guild_id)
+
+    def set_timezone(self, guild_id, name):
+        '''
+
+        Changes a guild's timezone and re-files its events under the new local dates
+
+        '''
+        local_tz = self.guild_timezones.set(guild_id, name)
+        guild_events = self._events.get(guild_id)
+        if guild_events is not None:
+            index = EventIndex(local_tz)
+            index.rebuild(guild_events.values())
+            self._indexes[guild_id] = index
+        self._bump(guild_id)
+        return local_tz
+
+    def _bump(self, guild_id):
+        self._versions[guild_id] = self._versions.get(guild_id, 0) + 1
+
+    def version(self, guild_id):
+        return self._versions.get(guild_id, 0)
+
+    def mark_stale(self, guild_id=None):
+        '''
+
+        Flags one guild (or every loaded guild when guild_id is None) to be re-fetched on next use
+
+        '''
+        if guild_id is None:
+            self._stale.update(self._events)
+        else:
+            self._stale.add(guild_id)
+
+    def drop_guild(self, guild_id):
+        self._events.pop(guild_id, None)
+        self._indexes.pop(guild_id, None)
+        self._stale.discard(guild_id)
+        self._bump(guild_id)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "guilds": len(self._events),
+            "events": sum(len(events) for events in self._events.values()),
+            "stale": len(self._stale),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,142 @@
+from bisect import bisect_right, insort
+from datetime import timedelta
+
+
+class _Bucket:
+    '''
+
+    Events sharing one (location, local date), kept sorted by start time.
+    prefix_max_end[i] is the latest end time among entries[0..i], which lets an
+    overlap query tell in O(1) whether anything before the bisect point reaches the new booking.
+
+    '''
+    __slots__ = ("entries", "starts", "prefix_max_end")
+
+    def __init__(self):
+        self.entries = []  # (start_utc, end_utc, event_id)
+        self.starts = []
+        self.prefix_max_end = []
+
+    def add(self, entry):
+        insort(self.entries, entry)
+        self._reindex()
+
+    def remove(self, event_id):
+        self.entries = [entry for entry in self.entries if entry[2] != event_id]
+        self._reindex()
+
+    def _reindex(self):
+        self.starts = [entry[0] for entry in self.entries]
+        self.prefix_max_end = []
+        latest = None
+        for _, end, _ in self.entries:
+            latest = end if latest is None or end > latest else latest
+            self.prefix_max_end.append(latest)
+
+    def find_touching(self, start, end):
+        '''
+
+        Returns the event id of an entry that overlaps or is adjacent to [start, end], or None
+
+        '''
+        i = bisect_right(self.starts, end)  # entries[:i] all start at or before the new end
+        if i == 0 or self.prefix_max_end[i - 1] < start:
+            return None
+        # Walk back to the entry that actually reaches the new start (usually the first one checked)
+        for j in range(i - 1, -1, -1):
+            if self.entries[j][1] >= start:
+                return self.entries[j][2]
+        return None
+
+    def nearest(self, start):
+        i = bisect_right(self.starts, start)
+        return self.entries[i - 1][2] if i > 0 else self.entries[0][2]
+
+
+class EventIndex:
+    '''
+
+    Index of one guild's scheduled events keyed by (lowercased location, local date).
+    Replaces the linear scan + per-event timezone conversion in get_event_to_update.
+
+    '''
+
+    def __init__(self, local_tz):
+        self.local_tz = local_tz
+        self._buckets = {}
+        self._keys = {}  # event_id -> bucket key, so updates can find the old entry
+        self._events = {}
+
+    def key_for(self, location, start_time):
+        return (location.lower(), start_time.astimezone(self.local_tz).date())
+
+    def rebuild(self, events):
+        self._buckets.clear()
+        self._keys.clear()
+        self._events.clear()
+        for event in events:
+            self.add(event)
+
+    def add(self, event):
+        self.remove(event.id)
+        if not event.location or event.start_time is None or event.end_time is None:
+            return
+        key = self.key_for(event.location, event.start_time)
+        self._buckets.setdefault(key, _Bucket()).add((event.start_time, event.end_time, event.id))
+        self._keys[event.id] = key
+        self._events[event.id] = event
+
+    def remove(self, event_id):
+        key = self._keys.pop(event_id, None)
+        self._events.pop(event_id, None)
+        if key is None:
+            return
+        bucket = self._buckets[key]
+        bucket.remove(event_id)
+        if not bucket.entries:
+            del self._buckets[key]
+
+    def _candidate_keys(self, location, start_time, end_time):
+        location = location.lower()
+        start_local = start_time.astimezone(self.local_tz)
+        end_local = end_time.astimezone(self.local_tz)
+        keys = [(location, start_local.date())]
+        # A booking that crosses midnight can also belong to an event filed under the next day
+        if start_local.time() > end_local.time():
+            keys.append((location, start_local.date() + timedelta(days=1)))
+        return keys
+
+    def find_match(self, location, start_time, end_time):
+        '''
+
+        Finds the event a booking belongs to. Returns (event, touching) where touching is True if the
+        event overlaps or is adjacent to the booking, or None if there is no event at that location/date
+
+        '''
+        fallback = None
+        for key in self._candidate_keys(location, start_time, end_time):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            event_id = bucket.find_touching(start_time, end_time)
+            if event_id is not None:
+                return self._events[event_id], True
+            if fallback is None:
+                fallback = self._events[bucket.nearest(start_time)]
+        # A booking at or after midnight can continue the previous night's event, but only if that event
+        # actually reaches it; an earlier day's event is never the fallback
+        previous_day = (location.lower(), start_time.astimezone(self.local_tz).date() - timedelta(days=1))
+        bucket = self._buckets.get(previous_day)
+        if bucket is not None:
+            event_id = bucket.find_touching(start_time, end_time)
+            if event_id is not None:
+                return self._events[event_id], True
+        if fallback is not None:
+            return fallback, False
+        return None
+
+    def events_at(self, location, start_time):
+        bucket = self._buckets.get(self.key_for(location, start_time))
+        if bucket is None:
+            return []
+        return [self._events[event_id] for _, _, event_id in bucket.entries]
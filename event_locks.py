@@ -0,0 +1,48 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+
+class EventLocks:
+    '''
+
+    asyncio locks keyed by (guild_id, event_id) (or any other hashable key) around read-merge-write sequences.
+    Commands for different events never wait on each other; locks are dropped once nobody holds or wants them.
+
+    '''
+
+    def __init__(self):
+        self._locks = {}
+        self._users = {}  # key -> number of tasks holding or waiting on the lock
+        self.acquisitions = 0
+        self.contended = 0
+        self.waits = deque(maxlen=500)  # seconds spent waiting, per acquisition
+
+    @asynccontextmanager
+    async def hold(self, key):
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._users[key] = self._users.get(key, 0) + 1
+        if lock.locked():
+            self.contended += 1
+        started = time.perf_counter()
+        try:
+            async with lock:
+                self.acquisitions += 1
+                self.waits.append(time.perf_counter() - started)
+                yield
+        finally:
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._locks[key]
+
+    def stats(self):
+        waits = sorted(self.waits)
+        return {
+            "held": sum(1 for lock in self._locks.values() if lock.locked()),
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+            "wait_max": waits[-1] if waits else 0.0,
+        }
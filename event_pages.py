@@ -0,0 +1,129 @@
+import re
+from collections import OrderedDict
+from datetime import date
+
+import discord
+
+
+'''
+
+Paginated rendering for get_events. Pages are plain strings cached per (guild, filters) and tagged with
+the event cache's version for that guild, so they are only re-rendered after the guild's events change.
+
+'''
+
+EVENTS_PER_PAGE = 10
+
+# <3get_events from:2024-11-01 to:2024-11-30 location:Price Gilbert
+FILTER_PATTERN = re.compile(r'(from|to|location):\s*(.*?)(?=\s+(?:from|to|location):|$)', re.IGNORECASE)
+
+
+def parse_event_filters(arg):
+    '''
+
+    Returns (first_date, last_date, location) from "from:YYYY-MM-DD to:YYYY-MM-DD location:..." (any may be missing).
+    Raises ValueError for a malformed date
+
+    '''
+    filters = {name.lower(): value.strip() for name, value in FILTER_PATTERN.findall(arg or "")}
+    first_date = date.fromisoformat(filters["from"]) if filters.get("from") else None
+    last_date = date.fromisoformat(filters["to"]) if filters.get("to") else None
+    return first_date, last_date, filters.get("location") or None
+
+
+def render_event(event, local_tz):
+    start = event.start_time.astimezone(local_tz)
+    end = event.end_time.astimezone(local_tz) if event.end_time else None
+    end_text = end.strftime('%A, %B %d, %Y at %I:%M %p') if end else "No end time"
+    return (f"**{event.name}**\nStart: {start.strftime('%A, %B %d, %Y at %I:%M %p')}\n"
+            f"End: {end_text}\nLocation: {event.location or 'No location specified'}\n")
+
+
+def render_pages(events, local_tz, first_date=None, last_date=None, location=None, per_page=EVENTS_PER_PAGE):
+    '''
+
+    Filters and sorts events, then renders them into pages of per_page events each
+
+    '''
+    location = location.lower() if location else None
+    selected = []
+    for event in events:
+        event_date = event.start_time.astimezone(local_tz).date()
+        if first_date and event_date < first_date:
+            continue
+        if last_date and event_date > last_date:
+            continue
+        if location and location not in (event.location or "").lower():
+            continue
+        selected.append(event)
+    selected.sort(key=lambda event: event.start_time)
+    return ["\n".join(render_event(event, local_tz) for event in selected[i:i + per_page])
+            for i in range(0, len(selected), per_page)]
+
+
+class PageCache:
+    '''
+
+    LRU of rendered pages keyed by (guild_id, filters), each entry remembering the event cache version it was built from
+
+    '''
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._pages = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, guild_id, filters, version):
+        entry = self._pages.get((guild_id, filters))
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            return None
+        self._pages.move_to_end((guild_id, filters))
+        self.hits += 1
+        return entry[1]
+
+    def put(self, guild_id, filters, version, pages):
+        self._pages[(guild_id, filters)] = (version, pages)
+        self._pages.move_to_end((guild_id, filters))
+        while len(self._pages) > self.max_entries:
+            self._pages.popitem(last=False)
+
+
+def page_embed(title, pages, page_number):
+    embed = discord.Embed(title=title, description=pages[page_number])
+    embed.set_footer(text=f"Page {page_number + 1}/{len(pages)}")
+    return embed
+
+
+class EventPagesView(discord.ui.View):
+    '''
+
+    Previous/next buttons for flipping through rendered pages
+
+    '''
+
+    def __init__(self, title, pages, timeout=180):
+        super().__init__(timeout=timeout)
+        self.title = title
+        self.pages = pages
+        self.page_number = 0
+        self._update_buttons()
+
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page_number == 0
+        self.next_page.disabled = self.page_number >= len(self.pages) - 1
+
+    async def _show(self, interaction):
+        self._update_buttons()
+        await interaction.response.edit_message(embed=page_embed(self.title, self.pages, self.page_number), view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        self.page_number = max(0, self.page_number - 1)
+        await self._show(interaction)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        self.page_number = min(len(self.pages) - 1, self.page_number + 1)
+        await self._show(interaction)
@@ -0,0 +1,83 @@
+import asyncio
+import itertools
+from collections import Counter
+
+
+'''
+
+Local stand-ins for the few discord.py objects the bot's commands touch, so they can be driven
+offline by benchmark.py. Every "API call" sleeps for `latency` seconds and is counted in api_calls.
+
+'''
+
+_ids = itertools.count(1_000_000)
+
+
+class FakeScheduledEvent:
+
+    def __init__(self, guild, name, description, start_time, end_time, location, **_):
+        self.guild = guild
+        self.guild_id = guild.id
+        self.id = next(_ids)
+        self.name = name
+        self.description = description
+        self.start_time = start_time
+        self.end_time = end_time
+        self.location = location
+        self.url = f"https://discord.com/events/{guild.id}/{self.id}"
+
+    async def edit(self, **fields):
+        await self.guild.api_call("edit")
+        for name, value in fields.items():
+            setattr(self, name, value)
+        return self
+
+
+class FakeGuild:
+
+    def __init__(self, guild_id=1, name="Fake Guild", latency=0.0):
+        self.id = guild_id
+        self.name = name
+        self.latency = latency
+        self.events = {}
+        self.api_calls = Counter()
+
+    async def api_call(self, name):
+        self.api_calls[name] += 1
+        await asyncio.sleep(self.latency)
+
+    async def fetch_scheduled_events(self):
+        await self.api_call("fetch_scheduled_events")
+        return list(self.events.values())
+
+    async def create_scheduled_event(self, **fields):
+        await self.api_call("create_scheduled_event")
+        event = FakeScheduledEvent(self, **fields)
+        self.events[event.id] = event
+        return event
+
+
+class FakeMessage:
+
+    def __init__(self, attachments=(), guild=None, content=None):
+        self.attachments = list(attachments)
+        self.guild = guild
+        self.content = content
+
+    async def edit(self, content=None, **kwargs):
+        await self.guild.api_call("edit_message")
+        self.content = content
+        return self
+
+
+class FakeContext:
+
+    def __init__(self, guild):
+        self.guild = guild
+        self.message = FakeMessage()
+        self.replies = []
+
+    async def send(self, content=None, **kwargs):
+        await self.guild.api_call("send")
+        self.replies.append(content if content is not None else kwargs)
+        return FakeMessage(guild=self.guild, content=content)
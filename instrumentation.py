@@ -0,0 +1,155 @@
+import functools
+import logging
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+'''
+
+Lightweight timing for the command hot paths plus the bot's logging setup.
+
+Each (command, stage) pair (parse, fetch, match, merge, write, reply) and each (guild, command) pair
+keeps a rolling window of its most recent durations, which <3stats and the optional Prometheus text
+dump (STATS_PROM_PATH) summarize as count/p50/p99.
+
+'''
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+STATS_PROM_PATH = os.getenv("STATS_PROM_PATH")
+
+logger = logging.getLogger("event_scheduler")
+
+
+def setup_logging():
+    logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+
+
+def log(level, message, **fields):
+    '''
+
+    Structured log line: message followed by key=value pairs. Skips all formatting when the level is disabled
+
+    '''
+    if logger.isEnabledFor(level):
+        logger.log(level, "%s %s", message, " ".join(f"{key}={value!r}" for key, value in fields.items()))
+
+
+def percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))]
+
+
+class Instrumentation:
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.stages = {}  # (command, stage) -> deque of seconds
+        self.guilds = {}  # (guild_id, command) -> deque of seconds
+        self.counts = {}  # (command, stage) -> total samples ever recorded
+
+    def record(self, command, stage, seconds, guild_id=None):
+        key = (command, stage)
+        samples = self.stages.get(key)
+        if samples is None:
+            samples = self.stages[key] = deque(maxlen=self.window)
+        samples.append(seconds)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        if guild_id is not None and stage == "total":
+            samples = self.guilds.get((guild_id, command))
+            if samples is None:
+                samples = self.guilds[(guild_id, command)] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    @contextmanager
+    def time(self, command, stage, guild_id=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(command, stage, time.perf_counter() - started, guild_id)
+
+    def summary(self):
+        '''
+
+        Returns {(command, stage): (count, p50, p99)} with times in seconds
+
+        '''
+        result = {}
+        for key, samples in self.stages.items():
+            ordered = sorted(samples)
+            result[key] = (self.counts[key], percentile(ordered, 0.5), percentile(ordered, 0.99))
+        return result
+
+    def guild_summary(self, guild_id):
+        result = {}
+        for (summary_guild_id, command), samples in self.guilds.items():
+            if summary_guild_id == guild_id:
+                ordered = sorted(samples)
+                result[command] = (len(ordered), percentile(ordered, 0.5), percentile(ordered, 0.99))
+        return result
+
+    def prometheus_text(self, extra_gauges=None):
+        lines = [
+            "# HELP event_scheduler_stage_seconds Time spent per command stage (rolling window)",
+            "# TYPE event_scheduler_stage_seconds summary",
+        ]
+        for (command, stage), (count, p50, p99) in sorted(self.summary().items()):
+            labels = f'command="{command}",stage="{stage}"'
+            lines.append(f'event_scheduler_stage_seconds{{{labels},quantile="0.5"}} {p50:.6f}')
+            lines.append(f'event_scheduler_stage_seconds{{{labels},quantile="0.99"}} {p99:.6f}')
+            lines.append(f"event_scheduler_stage_seconds_count{{{labels}}} {count}")
+        for name, value in (extra_gauges or {}).items():
+            lines.append(f"# TYPE event_scheduler_{name} gauge")
+            lines.append(f"event_scheduler_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump_prometheus(self, path=STATS_PROM_PATH, extra_gauges=None):
+        if not path:
+            return
+        # Write then rename so a scraper never reads a half-written file
+        with open(path + ".tmp", "w") as stats_file:
+            stats_file.write(self.prometheus_text(extra_gauges))
+        os.replace(path + ".tmp", path)
+
+
+class StartupProfile:
+    '''
+
+    Wall-clock time of each startup phase, reported by python run_bot.py --profile-startup
+
+    '''
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self._last = self.started
+        self.phases = []  # (phase, seconds)
+
+    def mark(self, phase):
+        # Records the time since the previous mark as `phase`
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self):
+        lines = [f"{phase:<32} {seconds * 1000:9.1f}ms" for phase, seconds in self.phases]
+        lines.append(f"{'total':<32} {(self._last - self.started) * 1000:9.1f}ms")
+        return "\n".join(lines)
+
+
+def timed_command(stats, command):
+    '''
+
+    Decorator for command callbacks: records the whole command as the "total" stage for its guild
+
+    '''
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(ctx, *args, **kwargs):
+            guild_id = ctx.guild.id if ctx.guild else None
+            with stats.time(command, "total", guild_id):
+                return await function(ctx, *args, **kwargs)
+        return wrapper
+    return decorator
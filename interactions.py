@@ -0,0 +1,63 @@
+import discord
+
+
+'''
+
+Lets the prefix-command callbacks in bot.py serve slash commands too. InteractionContext looks like a
+commands.Context to them (guild, channel, author, send, message.attachments), but replies go out as
+follow-ups to an interaction that has already been deferred, so slow Discord calls never hit the
+3-second timeout.
+
+'''
+
+
+class _InteractionMessage:
+
+    def __init__(self, attachments):
+        self.attachments = attachments
+
+
+class InteractionContext:
+
+    def __init__(self, interaction, attachments=()):
+        self.interaction = interaction
+        self.guild = interaction.guild
+        self.channel = interaction.channel
+        self.author = interaction.user
+        self.message = _InteractionMessage([attachment for attachment in attachments if attachment is not None])
+
+    async def send(self, content=None, **kwargs):
+        # Application webhooks always wait, so this returns the WebhookMessage (which can be edited later)
+        return await self.interaction.followup.send(content, **kwargs)
+
+
+async def run_deferred(interaction, callback, attachments=(), **kwargs):
+    '''
+
+    Defers the interaction, then runs a command callback with its replies sent as follow-ups
+
+    '''
+    await interaction.response.defer(thinking=True)
+    await callback(InteractionContext(interaction, attachments), **kwargs)
+
+
+class BookingModal(discord.ui.Modal):
+    '''
+
+    Modal with one big text box for pasting confirmation email(s); runs `callback` with the text as arg
+
+    '''
+
+    def __init__(self, title, callback):
+        super().__init__(title=title)
+        self.command_callback = callback
+        self.email = discord.ui.TextInput(
+            label="Confirmation email(s)",
+            style=discord.TextStyle.paragraph,
+            placeholder='The following bookings "..." have been confirmed: ...',
+            max_length=4000,
+        )
+        self.add_item(self.email)
+
+    async def on_submit(self, interaction):
+        await run_deferred(interaction, self.command_callback, arg=self.email.value)
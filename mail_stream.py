@@ -0,0 +1,183 @@
+import codecs
+import time
+
+import user_message_parser
+from dedup_index import booking_key
+
+
+'''
+
+Streaming ingest for big inputs: exported mailboxes (.mbox), large .eml/.txt attachments, huge pastes.
+
+ConfirmationStream is fed the input a chunk at a time and yields one Booking per confirmation as soon as
+the next one starts (or, through confirmations(), the confirmation's text, so the bot can parse them in
+batches in the parse pool instead of on the event loop), so only the current line and the few field lines of the current confirmation are
+ever held in memory, however large the file. A line is kept only if it starts a confirmation (an
+anchored match against the registered email formats' anchors) or looks like a "Label: value" field,
+so the boilerplate paragraphs are dropped before the field regexes ever see them.
+
+Bookings are deduplicated by check-in code (with the room and times, since the short codes do repeat
+across bookings), as mailboxes tend to hold forwards and replies of the same confirmation. Bodies are read as plain text; base64-encoded parts are not decoded.
+
+'''
+
+CHUNK_SIZE = 1 << 16
+
+# Field labels ("Space:", "Check In Code:", "Confirmation #:") all end within this many characters
+LABEL_WIDTH = 40
+
+# A "line" longer than this has no newlines in sight and can't be a field line, so it isn't kept around
+MAX_LINE_LENGTH = CHUNK_SIZE
+
+# Lines kept per confirmation; a real one needs well under this, so anything beyond is noise
+MAX_FIELD_LINES = 50
+
+# Streamed confirmations are handed to the parse pool this many at a time
+PARSE_BATCH = 1000
+
+# Single .eml/.txt files smaller than this are read whole instead: a small .eml goes through the email package
+# (which decodes any transfer encoding) and a small .txt isn't worth its own download session
+STREAM_MIN_BYTES = 1 << 20
+
+
+def should_stream(filename, size):
+    filename = filename.lower()
+    return filename.endswith(".mbox") or (filename.endswith((".eml", ".txt")) and size >= STREAM_MIN_BYTES)
+
+
+def file_chunks(path, chunk_size=CHUNK_SIZE):
+    with open(path, "rb") as mail_file:
+        while chunk := mail_file.read(chunk_size):
+            yield chunk
+
+
+async def attachment_chunks(attachment, chunk_size=CHUNK_SIZE):
+    '''
+
+    Downloads a Discord attachment a chunk at a time (attachment.read() would load all of it)
+
+    '''
+    import aiohttp  # installed with discord.py
+    async with aiohttp.ClientSession() as session:
+        async with session.get(attachment.url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(chunk_size):
+                yield chunk
+
+
+class ConfirmationStream:
+
+    def __init__(self, local_tz, seen_codes=None):
+        self.local_tz = local_tz
+        # booking_key of every booking already yielded; pass a shared set to dedupe across several streams
+        self.seen_codes = set() if seen_codes is None else seen_codes
+        self.bookings = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.bytes_read = 0
+        self.started = time.perf_counter()
+        self._reset()
+
+    def _reset(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._partial = ""  # text after the last newline, completed by the next chunk
+        self._current = None  # kept lines of the confirmation being read (None before the first one starts)
+
+    def feed(self, data):
+        '''
+
+        Takes the next chunk (bytes or str) and yields the bookings it completes
+
+        '''
+        for confirmation in self.confirmations(data):
+            booking = self.accept(self._parse(confirmation))
+            if booking is not None:
+                yield booking
+
+    def end(self):
+        '''
+
+        Marks the end of one input (the stream can then be fed the next file) and yields what that completes
+
+        '''
+        for confirmation in self.end_confirmations():
+            booking = self.accept(self._parse(confirmation))
+            if booking is not None:
+                yield booking
+
+    def confirmations(self, data):
+        '''
+
+        Like feed, but yields the text of each completed confirmation; pass each parse result to accept()
+
+        '''
+        if isinstance(data, bytes):
+            self.bytes_read += len(data)
+            data = self._decoder.decode(data)
+        lines = (self._partial + data).split("\n")
+        self._partial = lines.pop()
+        if len(self._partial) > MAX_LINE_LENGTH:
+            self._partial = ""
+        for line in lines:
+            confirmation = self._take_line(line)
+            if confirmation is not None:
+                yield confirmation
+
+    def end_confirmations(self):
+        tail = self._partial + self._decoder.decode(b"", final=True)
+        confirmation = self._take_line(tail) if tail else None
+        if confirmation is not None:
+            yield confirmation
+        confirmation = self._finish_confirmation()
+        if confirmation is not None:
+            yield confirmation
+        self._reset()
+
+    def accept(self, booking):
+        '''
+
+        Counts a parsed confirmation (None if it couldn't be parsed) and returns the booking unless it is a duplicate
+
+        '''
+        if booking is None:
+            self.failed += 1
+            return None
+        if booking.checkin_code is not None:
+            key = booking_key(booking)
+            if key in self.seen_codes:
+                self.duplicates += 1
+                return None
+            self.seen_codes.add(key)
+        self.bookings += 1
+        return booking
+
+    def rate(self):
+        # Bookings per second since the stream was created
+        elapsed = time.perf_counter() - self.started
+        return self.bookings / elapsed if elapsed > 0 else 0.0
+
+    def _take_line(self, line):
+        stripped = line.strip()
+        # Anchored match, so ordinary lines fail on their first characters
+        if user_message_parser.DISPATCH_PATTERN.match(stripped):
+            # A new confirmation starts, which completes the previous one
+            confirmation = self._finish_confirmation()
+            self._current = [stripped]
+            return confirmation
+        # Only "Label: value" lines can hold fields; the boilerplate paragraphs are dropped here
+        if self._current is not None and len(self._current) < MAX_FIELD_LINES and stripped.find(":", 0, LABEL_WIDTH) != -1:
+            self._current.append(stripped)
+        return None
+
+    def _finish_confirmation(self):
+        if not self._current:
+            return None
+        confirmation = "\n".join(self._current)
+        self._current = None
+        return confirmation
+
+    def _parse(self, confirmation):
+        try:
+            return user_message_parser.parse_booking(confirmation, self.local_tz)
+        except ValueError:
+            return None
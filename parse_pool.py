@@ -0,0 +1,73 @@
+import asyncio
+import os
+
+import user_message_parser
+from timezones import get_timezone
+
+
+'''
+
+Moves the CPU-bound part of big batch imports (regex parsing of hundreds of confirmation emails) off
+the event loop, so one guild pasting a huge batch can't hold up gateway heartbeats or other guilds.
+
+Batches smaller than PARSE_POOL_THRESHOLD are parsed inline, since shipping them to another process
+costs more than parsing them. PARSE_WORKERS=0 turns the pool off entirely.
+
+'''
+
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "2"))
+PARSE_POOL_THRESHOLD = int(os.getenv("PARSE_POOL_THRESHOLD", "200"))
+
+_pool = None
+
+
+def parse_many(confirmations, timezone_name):
+    '''
+
+    Parses each confirmation into a Booking, or None where it couldn't be parsed. Runs in the worker processes
+
+    '''
+    local_tz = get_timezone(timezone_name)
+    bookings = []
+    for confirmation in confirmations:
+        try:
+            bookings.append(user_message_parser.parse_booking(confirmation, local_tz))
+        except ValueError:
+            bookings.append(None)
+    return bookings
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # Started (and imported) on first use, so processes that never see a big batch never pay for it
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # Spawned, not forked: forking the bot would copy its running event loop and discord.py's keep-alive thread.
+        # Spawned workers re-import __main__, which is why the bot starts from run_bot.py rather than bot.py
+        _pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+async def parse_confirmations(confirmations, local_tz):
+    '''
+
+    Same result as parse_many, using the process pool for large batches
+
+    '''
+    # tz objects are rebuilt from their name in the workers rather than pickled
+    timezone_name = str(local_tz)
+    if PARSE_WORKERS <= 0 or len(confirmations) < PARSE_POOL_THRESHOLD:
+        return parse_many(confirmations, timezone_name)
+    loop = asyncio.get_running_loop()
+    chunk_size = -(-len(confirmations) // PARSE_WORKERS)
+    chunks = [confirmations[i:i + chunk_size] for i in range(0, len(confirmations), chunk_size)]
+    results = await asyncio.gather(*(loop.run_in_executor(_get_pool(), parse_many, chunk, timezone_name) for chunk in chunks))
+    return [booking for chunk in results for booking in chunk]
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import user_message_parser
+import timezones
+from instrumentation import log
+
+
+'''
+
+Background upkeep so the per-command working set stays small and descriptions stay consistent.
+
+Every RECONCILE_INTERVAL seconds a tick walks the guilds (picking up where the last tick stopped) until
+RECONCILE_BUDGET seconds are used up. For each guild it:
+  1. refreshes the event cache from REST, catching anything the gateway missed
+  2. drops events that have ended from the cache and index, so lookups only see live events
+  3. deletes bookings that haven't ended yet whose event no longer exists (deleted while the bot was offline)
+  4. moves bookings older than BOOKING_RETENTION_DAYS into the store's archive table
+  5. re-renders descriptions that are missing slots the store holds (lines deleted by hand, lost writes),
+     keeping any notes added by hand
+
+With several shard processes, a lease in the booking store keeps each guild to one pass per interval.
+
+'''
+
+RECONCILE_INTERVAL = float(os.getenv("RECONCILE_INTERVAL", "900"))
+RECONCILE_BUDGET = float(os.getenv("RECONCILE_BUDGET", "5"))
+BOOKING_RETENTION_DAYS = int(os.getenv("BOOKING_RETENTION_DAYS", "30"))
+
+
+class Reconciler:
+
+    def __init__(self, event_cache, booking_store, write_queue, event_locks, guild_timezones, owner,
+                 interval=RECONCILE_INTERVAL, budget=RECONCILE_BUDGET, retention_days=BOOKING_RETENTION_DAYS):
+        self.event_cache = event_cache
+        self.booking_store = booking_store
+        self.write_queue = write_queue
+        self.event_locks = event_locks
+        self.guild_timezones = guild_timezones
+        self.owner = owner  # lease owner name, so only one process reconciles a guild per interval
+        self.interval = interval
+        self.budget = budget
+        self.retention_days = retention_days
+        self._next_guild = 0  # where the next tick starts, so a tick that runs out of budget doesn't starve later guilds
+        self.ticks = 0
+        self.pruned = 0
+        self.orphaned = 0
+        self.archived = 0
+        self.normalized = 0
+        self.over_budget = 0
+        self.last_tick_seconds = 0.0
+
+    async def run(self, get_guilds):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tick(get_guilds())
+            except Exception as e:
+                # Keep the loop alive; the next tick retries
+                log(logging.ERROR, "reconcile tick failed", error=repr(e))
+
+    async def tick(self, guilds):
+        started = time.perf_counter()
+        deadline = started + self.budget
+        guilds = list(guilds)
+        done = 0
+        while done < len(guilds) and time.perf_counter() < deadline:
+            guild = guilds[(self._next_guild + done) % len(guilds)]
+            if self.booking_store.acquire_lease(f"reconcile:{guild.id}", self.owner, self.interval):
+                await self.reconcile_guild(guild, deadline)
+            done += 1
+        if guilds:
+            self._next_guild = (self._next_guild + done) % len(guilds)
+        if done < len(guilds):
+            self.over_budget += 1
+        self.ticks += 1
+        self.last_tick_seconds = time.perf_counter() - started
+        log(logging.DEBUG, "reconcile tick", guilds=done, of=len(guilds), seconds=round(self.last_tick_seconds, 3))
+
+    async def reconcile_guild(self, guild, deadline=None):
+        '''
+
+        Runs one guild's refresh/prune/archive/normalize pass. Returns (pruned, orphaned, archived, normalized)
+
+        '''
+        await self.event_cache.refresh(guild)
+        local_tz = self.guild_timezones.get(guild.id)
+        now = datetime.now(timezone.utc)
+        local_now = now.astimezone(local_tz)
+        today = local_now.date()
+
+        events = await self.event_cache.get_events(guild)
+        # Finished events drop out of Discord's list too, so only bookings that haven't ended are checked
+        orphaned = self.booking_store.delete_missing_events(guild.id, [event.id for event in events], today, local_now.hour * 60 + local_now.minute)
+
+        live_events = []
+        pruned = 0
+        for event in events:
+            if (event.end_time or event.start_time) < now:
+                self.event_cache.remove(event)
+                pruned += 1
+            else:
+                live_events.append(event)
+
+        cutoff = today - timedelta(days=self.retention_days)
+        archived = self.booking_store.archive_before(guild.id, cutoff)
+
+        edits = []
+        for event in live_events:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            edit = await self._normalize(guild, event, local_tz)
+            if edit is not None:
+                edits.append(edit)
+        results = await asyncio.gather(*edits, return_exceptions=True)
+        failed = sum(1 for result in results if isinstance(result, BaseException))
+        normalized = len(edits) - failed
+
+        self.pruned += pruned
+        self.orphaned += orphaned
+        self.archived += archived
+        self.normalized += normalized
+        if pruned or orphaned or archived or edits:
+            log(logging.INFO, "reconciled guild", guild=guild.id, pruned=pruned, orphaned=orphaned, archived=archived, normalized=normalized, failed=failed)
+        return pruned, orphaned, archived, normalized
+
+    async def _normalize(self, guild, event, local_tz):
+        # Returns the queued edit's future if the description is missing stored slots, else None
+        async with self.event_locks.hold((guild.id, event.id)):
+            event = self.event_cache.get_cached(guild.id, event.id) or event
+            # A command is about to write this description anyway
+            if "description" in self.write_queue.pending_fields(event.id):
+                return None
+            described = user_message_parser.SlotSet.from_description(event.description)
+            # Events that never had booking lines (made by hand for something else) are left alone
+            if not described or not event.location:
+                return None
+            # Lines added by hand are adopted into the store; the store then renders the slots
+            self.booking_store.record_slots(guild.id, event.id, event.location, timezones.local_date(event.start_time, local_tz), described, event.name)
+            slot_set = self.booking_store.slots_for_event(guild.id, event.id)
+            # Only different slots count as drift, not how the lines are padded or ordered
+            if slot_set.slots == described.slots:
+                return None
+            # Anything that isn't a slot line (notes added by hand) is kept under the slots
+            notes = [line for line in event.description.splitlines() if line.strip() and not user_message_parser.SLOT_PATTERN.search(line)]
+            return self.write_queue.submit(event, description="\n".join([slot_set.serialize()] + notes))
+
+    def stats(self):
+        return {
+            "ticks": self.ticks,
+            "pruned": self.pruned,
+            "orphaned": self.orphaned,
+            "archived": self.archived,
+            "normalized": self.normalized,
+            "over_budget": self.over_budget,
+            "last_tick_seconds": self.last_tick_seconds,
+        }
@@ -0,0 +1,167 @@
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from time_tokens import format_clock, parse_clock
+from user_message_parser import MONTHS, Booking
+
+
+'''
+
+Recurring bookings: "every Sunday 6-8pm in Price Gilbert 2216 until Dec 15".
+
+parse_recurrence turns the text into a Recurrence, and Recurrence.occurrences yields one Booking per
+week lazily, so nothing is built for weeks that are never looked at.
+
+'''
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Written into the event description where a confirmation email would have its check in code
+RECURRING_CODE = "WEEKLY"
+
+# Two years of weekly events is plenty; anything more is almost certainly a typo in the end date
+MAX_OCCURRENCES = 104
+
+_CLOCK = r'\d{1,2}(?::\d{2})?\s*(?:[ap]m)?'
+
+# ["NAME"] every <weekday> <start>-<end> in <location> until <date> [starting <date>]
+RECURRENCE_PATTERN = re.compile(
+    r'^\s*(?:"(?P<event_name>[^"]+)"\s+)?'
+    r'every\s+(?P<weekday>[a-z]+)\s+'
+    rf'(?P<start>{_CLOCK})\s*(?:-|–|—|to)\s*(?P<end>{_CLOCK})\s+'
+    r'(?:in|at)\s+(?P<location>.+?)\s+'
+    r'until\s+(?P<until>.+?)'
+    r'(?:\s+(?:starting|from)\s+(?P<starting>.+?))?\s*$',
+    re.IGNORECASE
+)
+
+_MONTH_DAY = re.compile(r'^(?P<month>[a-z]+)\.?\s+(?P<day>\d{1,2})(?:st|nd|rd|th)?(?:,?\s+(?P<year>\d{4}))?$', re.IGNORECASE)
+_NUMERIC_DAY = re.compile(r'^(?P<month>\d{1,2})/(?P<day>\d{1,2})(?:/(?P<year>\d{4}))?$')
+
+
+def _parse_weekday(text):
+    text = text.lower()
+    for number, weekday in enumerate(WEEKDAYS):
+        # "sun", "sunday", "sundays"
+        if len(text) >= 3 and (weekday.startswith(text) or text == weekday + "s"):
+            return number
+    raise ValueError(f"Unknown weekday: {text!r}")
+
+
+def _parse_day(text, today):
+    '''
+
+    "Dec 15", "December 15, 2025", "12/15", "12/15/2025" or "2025-12-15". Without a year, the next such day from today
+
+    '''
+    text = text.strip()
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        pass
+    match = _MONTH_DAY.match(text) or _NUMERIC_DAY.match(text)
+    if match is None:
+        raise ValueError(f"Invalid date: {text!r}")
+    month = match["month"]
+    if not month.isdigit():
+        month = next((number for name, number in MONTHS.items() if len(month) >= 3 and name.startswith(month.lower())), None)
+        if month is None:
+            raise ValueError(f"Invalid date: {text!r}")
+    day = date(int(match["year"] or today.year), int(month), int(match["day"]))
+    if match["year"] is None and day < today:
+        day = day.replace(year=day.year + 1)
+    return day
+
+
+def _parse_times(start, end):
+    # "6-8pm": the start takes the end's am/pm, unless that would put it after the end ("11-1pm" is 11am)
+    start = start.replace(" ", "").lower()
+    end = end.replace(" ", "").lower()
+    if not end.endswith(("am", "pm")):
+        raise ValueError(f"Invalid time: {end!r}")
+
+    def minutes(clock, meridiem):
+        if not clock.endswith(("am", "pm")):
+            clock += meridiem
+        hour_minute = clock[:-2]
+        if ":" not in hour_minute:
+            hour_minute += ":00"
+        return parse_clock(hour_minute + clock[-2:])
+
+    end_minute = minutes(end, "")
+    start_minute = minutes(start, end[-2:])
+    if not start.endswith(("am", "pm")) and start_minute >= end_minute:
+        start_minute = minutes(start, "am" if end.endswith("pm") else "pm")
+    return start_minute, end_minute
+
+
+@dataclass(slots=True, frozen=True)
+class Recurrence:
+    '''
+
+    A weekly booking. Minutes are local time of day; an end at or before the start runs past midnight
+
+    '''
+    event_name: str
+    location: str
+    weekday: int
+    start_minute: int
+    end_minute: int
+    first_date: date
+    last_date: date
+
+    def dates(self):
+        day = self.first_date + timedelta(days=(self.weekday - self.first_date.weekday()) % 7)
+        for _ in range(MAX_OCCURRENCES):
+            if day > self.last_date:
+                return
+            yield day
+            day += timedelta(days=7)
+
+    def occurrences(self, local_tz):
+        '''
+
+        Yields one Booking per week, in date order
+
+        '''
+        duration = (self.end_minute - self.start_minute) % (24 * 60) or 24 * 60
+        for day in self.dates():
+            start = datetime(day.year, day.month, day.day) + timedelta(minutes=self.start_minute)
+            yield Booking(
+                event_name=self.event_name,
+                location=self.location,
+                checkin_code=RECURRING_CODE,
+                start_time=local_tz.localize(start),
+                end_time=local_tz.localize(start + timedelta(minutes=duration))
+            )
+
+    def describe(self):
+        return (f"{self.event_name}: every {WEEKDAYS[self.weekday].capitalize()} "
+                f"{format_clock(self.start_minute)} - {format_clock(self.end_minute)} in {self.location}, "
+                f"{self.first_date} to {self.last_date}")
+
+
+def parse_recurrence(text, today):
+    '''
+
+    Parses '["NAME"] every <weekday> <start>-<end> in <location> until <date> [starting <date>]'.
+    `today` is the guild's local date. Raises ValueError for anything it can't read
+
+    '''
+    match = RECURRENCE_PATTERN.match(text)
+    if match is None:
+        raise ValueError("Invalid recurrence format")
+    start_minute, end_minute = _parse_times(match["start"], match["end"])
+    first_date = _parse_day(match["starting"], today) if match["starting"] else today
+    last_date = _parse_day(match["until"], first_date)
+    location = match["location"].strip()
+    return Recurrence(
+        event_name=match["event_name"] or location,
+        location=location,
+        weekday=_parse_weekday(match["weekday"]),
+        start_minute=start_minute,
+        end_minute=end_minute,
+        first_date=first_date,
+        last_date=last_date
+    )
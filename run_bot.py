@@ -0,0 +1,17 @@
+import sys
+
+
+'''
+
+Starts the bot: python run_bot.py [--profile-startup]
+
+bot.py does all of its setup (loading .env, opening the booking store, building the bot and its caches)
+at import time. The parse pool's worker processes are spawned, and spawned processes re-import the
+__main__ module, so the entry point is this file, which does nothing at import time; the workers then
+only import parse_pool and user_message_parser.
+
+'''
+
+if __name__ == "__main__":
+    import bot
+    sys.exit(bot.main())
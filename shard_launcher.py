@@ -0,0 +1,49 @@
+import argparse
+import os
+import signal
+import subprocess
+import sys
+
+
+'''
+
+Runs the bot as several processes, each handling a group of shards: python shard_launcher.py --shards 4 --processes 2
+
+Discord routes every guild to exactly one shard, so each process only ever sees its own guilds and keeps
+its own event cache and locks for them. What has to be shared (bookings, timezones, auto-ingest channels
+and the leases that stop two processes doing the same one-off work) lives in the SQLite booking store,
+which every process opens in WAL mode.
+
+'''
+
+
+def shard_groups(shard_count, processes):
+    # Round-robin, e.g. 4 shards over 2 processes -> [0, 2] and [1, 3]
+    return [list(range(group, shard_count, processes)) for group in range(min(processes, shard_count))]
+
+
+def launch(shard_count, processes):
+    bot_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_bot.py")
+    children = []
+    for shard_ids in shard_groups(shard_count, processes):
+        env = dict(os.environ, SHARD_COUNT=str(shard_count), SHARD_IDS=",".join(map(str, shard_ids)))
+        children.append(subprocess.Popen([sys.executable, bot_path], env=env))
+
+    def stop(signum, frame):
+        for child in children:
+            child.send_signal(signal.SIGINT)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    # If one process dies the others keep serving their shards. Every child is waited for, so none is left
+    # running unsignalled after the launcher exits; the exit code reports the first failure
+    codes = [child.wait() for child in children]
+    return next((code for code in codes if code), 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the bot as one process per group of shards")
+    parser.add_argument("--shards", type=int, required=True, help="total number of shards")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="number of bot processes")
+    args = parser.parse_args()
+    sys.exit(launch(args.shards, args.processes))
@@ -17,3 +17,16 @@ You are required to check in to your room on the display. If you do not check in
 
 Check In Code: P7T4
 '''
+
+ems_text = '''
+Reservation Confirmed
+
+Event Name: STUDY SLAY
+Room: CULC 152
+Date: 11/17/2024
+Time: 6:00 PM - 8:00 PM
+
+Your reservation has been approved. Please arrive on time; rooms not occupied within 15 minutes of the start time may be released.
+
+Confirmation #: 24117731
+'''
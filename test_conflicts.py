@@ -0,0 +1,59 @@
+from datetime import date
+
+from conflicts import conflicts_for, find_conflicts, slots_from_rows
+
+DAY = date(2024, 11, 17)
+
+
+def row(location, start, end, code, name, local_date=DAY):
+    # Same shape as booking_store.bookings_between rows
+    return (location, local_date, start, end, code, name)
+
+
+def kinds(conflicts):
+    return sorted((conflict.kind, conflict.first.checkin_code, conflict.second.checkin_code) for conflict in conflicts)
+
+
+def test_two_groups_in_one_room():
+    slots = slots_from_rows([row("room 1", 1080, 1200, "A", "Slay"), row("room 1", 1140, 1260, "B", "Chess")])
+    assert kinds(find_conflicts(slots)) == [("room", "A", "B")]
+
+
+def test_one_group_in_two_rooms():
+    slots = slots_from_rows([row("room 1", 1080, 1200, "A", "Slay"), row("room 2", 1140, 1260, "B", "slay")])
+    assert kinds(find_conflicts(slots)) == [("group", "A", "B")]
+
+
+def test_back_to_back_bookings_do_not_overlap():
+    slots = slots_from_rows([row("room 1", 1080, 1200, "A", "Slay"), row("room 1", 1200, 1320, "B", "Chess"),
+                             row("room 2", 1200, 1320, "C", "Slay")])
+    assert find_conflicts(slots) == []
+
+
+def test_the_same_group_extending_its_own_room_is_not_a_conflict():
+    slots = slots_from_rows([row("room 1", 1080, 1200, "A", "Slay"), row("room 1", 1140, 1260, "B", "Slay")])
+    assert find_conflicts(slots) == []
+
+
+def test_every_overlapping_pair_is_reported():
+    slots = slots_from_rows([row("room 1", 600, 1200, "A", "Slay"), row("room 1", 660, 720, "B", "Chess"),
+                             row("room 1", 900, 960, "C", "Chess")])
+    assert kinds(find_conflicts(slots)) == [("room", "A", "B"), ("room", "A", "C")]
+
+
+def test_bookings_after_midnight_clash_with_the_next_days():
+    # 12:00AM - 2:00AM stored under the 17th continues that night, so it overlaps the 18th's 1:00AM booking
+    slots = slots_from_rows([row("room 1", 1320, 1440, "A", "Slay"), row("room 1", 0, 120, "B", "Slay"),
+                             row("room 1", 60, 180, "C", "Chess", date(2024, 11, 18))])
+    assert kinds(find_conflicts(slots)) == [("room", "B", "C")]
+
+
+def test_same_time_on_different_days_is_not_a_conflict():
+    slots = slots_from_rows([row("room 1", 1080, 1200, "A", "Slay"), row("room 1", 1080, 1200, "B", "Chess", date(2024, 11, 18))])
+    assert find_conflicts(slots) == []
+
+
+def test_conflicts_for_only_reports_the_recorded_bookings():
+    slots = slots_from_rows([row("room 1", 1080, 1200, "A", "Slay"), row("room 1", 1140, 1260, "B", "Chess"),
+                             row("room 2", 600, 700, "C", "Slay"), row("room 2", 650, 750, "D", "Chess")])
+    assert kinds(conflicts_for(slots, [("Room 1", DAY, (1080, 1200, "A"))])) == [("room", "A", "B")]
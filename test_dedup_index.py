@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+
+from dedup_index import DedupIndex, booking_key, text_key
+from user_message_parser import Booking
+
+NOW = datetime(2024, 11, 17, 12, tzinfo=timezone.utc)
+
+
+def booking(code, hours_from_now=6, location="Price Gilbert 2216"):
+    start = NOW + timedelta(hours=hours_from_now)
+    return Booking(event_name="STUDY SLAY", location=location, checkin_code=code, start_time=start, end_time=start + timedelta(hours=2))
+
+
+def test_remembered_keys_are_seen_by_that_guild_only():
+    index = DedupIndex()
+    first = booking("P7T4")
+    index.remember(1, [text_key("email"), booking_key(first)], first, event_id=10)
+    assert index.seen(1, text_key("  email\n"), NOW)
+    assert index.seen(1, booking_key(booking("P7T4")), NOW)
+    assert not index.seen(2, booking_key(first), NOW)
+    assert not index.seen(1, booking_key(booking("P7T4", location="CULC 152")), NOW)
+    assert (index.hits, index.misses) == (2, 2)
+
+
+def test_entries_expire_when_the_booking_ends():
+    index = DedupIndex()
+    first = booking("P7T4")
+    index.remember(1, [booking_key(first)], first)
+    assert index.seen(1, booking_key(first), first.end_utc - timedelta(minutes=1))
+    assert not index.seen(1, booking_key(first), first.end_utc)
+    # The expired entry is gone for good
+    assert index.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    index = DedupIndex(max_entries=2)
+    a, b, c = booking("A"), booking("B"), booking("C")
+    index.remember(1, [booking_key(a)], a, now=NOW)
+    index.remember(1, [booking_key(b)], b, now=NOW)
+    assert index.seen(1, booking_key(a), NOW)  # A is now more recent than B
+    index.remember(1, [booking_key(c)], c, now=NOW)
+    assert index.seen(1, booking_key(a), NOW)
+    assert not index.seen(1, booking_key(b), NOW)
+    assert index.seen(1, booking_key(c), NOW)
+    assert index.evicted == 1
+
+
+def test_expired_entries_are_evicted_before_live_ones():
+    index = DedupIndex(max_entries=2)
+    ended = booking("OLD", hours_from_now=-1000)
+    a, b = booking("A"), booking("B")
+    # A is the least recently used, but the ended booking goes first
+    index.remember(1, [booking_key(a)], a, now=NOW)
+    index.remember(1, [booking_key(ended)], ended, now=NOW)
+    index.remember(1, [booking_key(b)], b, now=NOW)
+    assert index.seen(1, booking_key(a), NOW)
+    assert index.seen(1, booking_key(b), NOW)
+    assert index.evicted == 1
+
+
+def test_forgetting_an_event_or_guild():
+    index = DedupIndex()
+    a, b = booking("A"), booking("B")
+    index.remember(1, [booking_key(a)], a, event_id=10)
+    index.remember(1, [booking_key(b)], b, event_id=11)
+    index.remember(2, [booking_key(a)], a, event_id=20)
+    index.forget_event(1, 10)
+    assert not index.seen(1, booking_key(a), NOW)
+    assert index.seen(1, booking_key(b), NOW)
+    index.drop_guild(1)
+    assert not index.seen(1, booking_key(b), NOW)
+    assert index.seen(2, booking_key(a), NOW)
@@ -0,0 +1,41 @@
+from datetime import date
+
+import pytz
+
+import timezones
+from user_message_parser import SlotSet, parse_booking
+
+import test
+
+NEW_YORK = pytz.timezone("America/New_York")
+
+
+def confirmation(day, times):
+    # The Georgia Tech fixture moved to another date and time
+    return test.text.replace("Date: Sunday, November 17, 2024", f"Date: {day.strftime('%A, %B')} {day.day}, {day.year}").replace(
+        "Time: 6:00pm - 8:00pm", f"Time: {times}")
+
+
+def test_slot_on_the_day_clocks_fall_back():
+    # 12:00am - 3:00am on 2024-11-03 lasts four hours, but the slot is still the wall-clock times
+    booking = parse_booking(confirmation(date(2024, 11, 3), "12:00am - 3:00am"), NEW_YORK)
+    assert booking.slot == (0, 180, "P7T4")
+    assert SlotSet([booking.slot]).serialize() == "12:00AM - 3:00AM: P7T4"
+
+
+def test_slot_on_the_day_clocks_spring_forward():
+    # 1:00am - 4:00am on 2024-03-10 lasts two hours
+    booking = parse_booking(confirmation(date(2024, 3, 10), "1:00am - 4:00am"), NEW_YORK)
+    assert booking.slot == (60, 240, "P7T4")
+    assert SlotSet([booking.slot]).serialize() == "1:00AM - 4:00AM: P7T4"
+
+
+def test_slot_across_midnight_into_a_dst_change():
+    booking = parse_booking(confirmation(date(2024, 11, 2), "10:00pm - 3:00am"), NEW_YORK)
+    assert booking.slot == (1320, 1620, "P7T4")
+
+
+def test_dst_day_slot_converts_back_to_the_booked_times():
+    booking = parse_booking(confirmation(date(2024, 11, 3), "12:00am - 3:00am"), NEW_YORK)
+    [(start_utc, end_utc)] = timezones.slots_to_utc(date(2024, 11, 3), [booking.slot[:2]], NEW_YORK)
+    assert (start_utc, end_utc) == (booking.start_utc, booking.end_utc)
@@ -0,0 +1,87 @@
+from datetime import date, datetime, timedelta, timezone
+
+from event_index import EventIndex
+from user_message_parser import SlotSet, merge_intervals, unwrap_midnight
+
+# Fixed offset so these don't depend on pytz or the machine's timezone
+LOCAL_TZ = timezone(timedelta(hours=-5))
+
+
+class _Event:
+
+    def __init__(self, event_id, location, start_time, end_time):
+        self.id = event_id
+        self.location = location
+        self.start_time = start_time
+        self.end_time = end_time
+
+
+def local(day, hour):
+    return datetime(2024, 11, day, tzinfo=LOCAL_TZ) + timedelta(hours=hour)
+
+
+def test_unwrap_midnight_moves_slots_after_midnight_to_the_end():
+    slots = sorted([(1320, 1440, "A"), (0, 120, "B")])
+    assert unwrap_midnight(slots) == [(1320, 1440, "A"), (1440, 1560, "B")]
+
+
+def test_unwrap_midnight_leaves_a_single_day_alone():
+    slots = [(600, 720, "A"), (1080, 1200, "B")]
+    assert unwrap_midnight(slots) == slots
+
+
+def test_unwrap_midnight_leaves_early_morning_slots_unconnected_to_the_night():
+    # Nothing reaches midnight, so 1:00AM is the start of the day rather than the end of the night
+    slots = [(60, 120, "A"), (1320, 1380, "B")]
+    assert unwrap_midnight(slots) == slots
+
+
+def test_merge_intervals_joins_overlapping_and_adjacent_slots():
+    runs, longest = merge_intervals([(600, 720), (720, 840), (800, 900), (1080, 1200)])
+    assert runs == [(600, 900), (1080, 1200)]
+    assert longest == (600, 900)
+
+
+def test_merge_intervals_across_midnight():
+    runs, longest = merge_intervals(unwrap_midnight(sorted([(1320, 1440), (0, 120)])))
+    assert runs == [(1320, 1560)]
+    assert longest == (1320, 1560)
+
+
+def test_merge_intervals_empty():
+    assert merge_intervals([]) == ([], None)
+
+
+def test_slot_set_description_across_midnight():
+    slot_set = SlotSet.from_description("12:00AM - 2:00AM: BBBB\n10:00PM - 12:00AM: AAAA")
+    assert slot_set.serialize() == "10:00PM - 12:00AM: AAAA\n12:00AM - 2:00AM: BBBB"
+    assert slot_set.find_gap() is None
+    assert slot_set.largest_interval() == (1320, 1560)
+
+
+def test_index_matches_booking_that_crosses_into_the_next_days_event():
+    index = EventIndex(LOCAL_TZ)
+    index.rebuild([_Event(1, "Room 1", local(18, 0), local(18, 2))])
+    event, touching = index.find_match("room 1", local(17, 23), local(18, 0))
+    assert event.id == 1 and touching
+
+
+def test_index_matches_booking_after_midnight_to_the_previous_nights_event():
+    index = EventIndex(LOCAL_TZ)
+    index.rebuild([_Event(1, "Room 1", local(17, 22), local(18, 0))])
+    event, touching = index.find_match("room 1", local(18, 0), local(18, 2))
+    assert event.id == 1 and touching
+
+
+def test_index_prefers_the_same_days_event_after_midnight():
+    index = EventIndex(LOCAL_TZ)
+    index.rebuild([_Event(1, "Room 1", local(17, 22), local(18, 0)), _Event(2, "Room 1", local(18, 2), local(18, 4))])
+    event, touching = index.find_match("room 1", local(18, 0), local(18, 2))
+    assert event.id == 2 and touching
+
+
+def test_index_never_falls_back_to_the_previous_day():
+    index = EventIndex(LOCAL_TZ)
+    index.rebuild([_Event(1, "Room 1", local(17, 22), local(18, 0))])
+    assert index.find_match("room 1", local(18, 1), local(18, 3)) is None
+    assert index.key_for("Room 1", local(18, 1)) == ("room 1", date(2024, 11, 18))
@@ -0,0 +1,89 @@
+from datetime import date
+
+import pytest
+import pytz
+
+from recurrence import MAX_OCCURRENCES, _parse_day, _parse_times, parse_recurrence
+
+
+def test_start_takes_the_ends_meridiem():
+    assert _parse_times("6", "8pm") == (18 * 60, 20 * 60)
+    assert _parse_times("9", "11am") == (9 * 60, 11 * 60)
+
+
+def test_start_switches_meridiem_when_it_would_come_after_the_end():
+    # "11-1pm" is 11am - 1pm, and "10-12pm" is 10am - noon
+    assert _parse_times("11", "1pm") == (11 * 60, 13 * 60)
+    assert _parse_times("10", "12pm") == (10 * 60, 12 * 60)
+    assert _parse_times("11:30", "12:30pm") == (11 * 60 + 30, 12 * 60 + 30)
+
+
+def test_late_start_before_an_am_end_runs_past_midnight():
+    # "11-2am" can only be 11pm - 2am
+    assert _parse_times("11", "2am") == (23 * 60, 2 * 60)
+
+
+def test_explicit_meridiems_are_kept():
+    assert _parse_times("10pm", "12am") == (22 * 60, 0)
+    assert _parse_times("6:30 pm", "8 pm") == (18 * 60 + 30, 20 * 60)
+
+
+def test_end_needs_a_meridiem():
+    with pytest.raises(ValueError):
+        _parse_times("6", "8")
+
+
+def test_day_without_a_year_is_the_next_such_day():
+    today = date(2024, 11, 17)
+    assert _parse_day("Dec 15", today) == date(2024, 12, 15)
+    assert _parse_day("12/15", today) == date(2024, 12, 15)
+    assert _parse_day("Nov 17", today) == date(2024, 11, 17)
+
+
+def test_day_already_past_this_year_rolls_over():
+    today = date(2024, 11, 17)
+    assert _parse_day("Jan 5", today) == date(2025, 1, 5)
+    assert _parse_day("Nov 16", today) == date(2025, 11, 16)
+
+
+def test_day_with_a_year_never_rolls_over():
+    today = date(2024, 11, 17)
+    assert _parse_day("January 5, 2024", today) == date(2024, 1, 5)
+    assert _parse_day("1/5/2024", today) == date(2024, 1, 5)
+    assert _parse_day("2024-01-05", today) == date(2024, 1, 5)
+
+
+def test_day_rejects_unknown_months():
+    with pytest.raises(ValueError):
+        _parse_day("Smarch 3", date(2024, 11, 17))
+
+
+def test_parse_recurrence():
+    weekly = parse_recurrence('"STUDY SLAY" every Sunday 6-8pm in Price Gilbert 2216 until Dec 15', date(2024, 11, 13))
+    assert (weekly.event_name, weekly.location, weekly.start_minute, weekly.end_minute) == ("STUDY SLAY", "Price Gilbert 2216", 18 * 60, 20 * 60)
+    assert list(weekly.dates()) == [date(2024, 11, 17), date(2024, 11, 24), date(2024, 12, 1), date(2024, 12, 8), date(2024, 12, 15)]
+
+
+def test_parse_recurrence_until_rolls_over_from_the_start_date():
+    # "until Jan 12" after "starting Dec 1" is the following January
+    weekly = parse_recurrence("every sun 10pm-12am at CULC 152 until Jan 12 starting Dec 1", date(2024, 11, 13))
+    assert weekly.event_name == "CULC 152"
+    assert (weekly.first_date, weekly.last_date) == (date(2024, 12, 1), date(2025, 1, 12))
+
+
+def test_occurrences_past_midnight_end_the_next_day():
+    weekly = parse_recurrence("every sun 10pm-12am at CULC 152 until Dec 1", date(2024, 11, 13))
+    booking = next(weekly.occurrences(pytz.timezone("America/New_York")))
+    assert booking.start_time.date() == date(2024, 11, 17)
+    assert booking.end_time.date() == date(2024, 11, 18)
+    assert booking.slot == (22 * 60, 24 * 60, "WEEKLY")
+
+
+def test_occurrences_are_capped():
+    weekly = parse_recurrence("every monday 9-10am in Room 1 until 2099-01-01", date(2024, 11, 13))
+    assert len(list(weekly.dates())) == MAX_OCCURRENCES
+
+
+def test_parse_recurrence_rejects_other_text():
+    with pytest.raises(ValueError):
+        parse_recurrence("see you all at 6 tonight!", date(2024, 11, 13))
@@ -0,0 +1,65 @@
+from functools import lru_cache
+
+
+'''
+
+Fast conversion between clock strings like "6:00PM" and minutes past midnight.
+
+There are only 1,440 minutes in a day, so every spelling the booking emails and
+event descriptions use is precomputed once at import instead of going through
+datetime.strptime (which takes a lock and re-checks its format cache on every call).
+
+'''
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def _clock_parts(minutes):
+    hour, minute = divmod(minutes, 60)
+    return hour % 12 or 12, minute, "AM" if hour < 12 else "PM"
+
+
+# minute -> "6:00PM" (what the bot writes into descriptions)
+MINUTES_TO_CLOCK = tuple(f"{hour}:{minute:02d}{meridiem}" for hour, minute, meridiem in map(_clock_parts, range(MINUTES_PER_DAY)))
+# minute -> "06:00PM" (strftime("%I:%M%p") style)
+MINUTES_TO_PADDED_CLOCK = tuple(f"{hour:02d}:{minute:02d}{meridiem}" for hour, minute, meridiem in map(_clock_parts, range(MINUTES_PER_DAY)))
+
+# Every spelling we expect to see: with/without the leading zero, upper/lower case am/pm
+CLOCK_TO_MINUTES = {}
+for _minutes in range(MINUTES_PER_DAY):
+    for _clock in (MINUTES_TO_CLOCK[_minutes], MINUTES_TO_PADDED_CLOCK[_minutes]):
+        CLOCK_TO_MINUTES[_clock] = _minutes
+        CLOCK_TO_MINUTES[_clock.lower()] = _minutes
+del _minutes, _clock
+
+
+@lru_cache(maxsize=256)
+def _parse_unusual_clock(clock):
+    # Anything the table doesn't cover ("6:00 pm", "6:00Pm", ...) is parsed by hand and remembered
+    normalized = clock.replace(" ", "").upper()
+    minutes = CLOCK_TO_MINUTES.get(normalized)
+    if minutes is None:
+        raise ValueError(f"Invalid time: {clock!r}")
+    return minutes
+
+
+def parse_clock(clock: str):
+    '''
+
+    "6:00pm" -> 1080. Raises ValueError for anything that isn't a 12-hour clock time
+
+    '''
+    minutes = CLOCK_TO_MINUTES.get(clock)
+    if minutes is None:
+        return _parse_unusual_clock(clock)
+    return minutes
+
+
+def format_clock(minutes: int, zero_pad=False):
+    '''
+
+    1080 -> "6:00PM" (or "06:00PM" with zero_pad). Minutes past 1440 wrap into the next day
+
+    '''
+    table = MINUTES_TO_PADDED_CLOCK if zero_pad else MINUTES_TO_CLOCK
+    return table[minutes % MINUTES_PER_DAY]
@@ -0,0 +1,82 @@
+import os
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+
+'''
+
+Timezone handling for the bot: every guild has a configured timezone (default America/New_York,
+or BOT_TIMEZONE from .env) that is resolved once, plus helpers to move whole slot lists between
+local minutes-past-midnight and UTC datetimes.
+
+'''
+
+DEFAULT_TIMEZONE = os.getenv("BOT_TIMEZONE", "America/New_York")
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name: str):
+    # pytz is imported on first use rather than at startup, and pytz.timezone parses the zoneinfo
+    # file the first time a name is seen, so only ever do it once per name
+    import pytz
+    return pytz.timezone(name)
+
+
+class GuildTimezones:
+    '''
+
+    Maps guild ids to their configured tz objects
+
+    '''
+
+    def __init__(self, default=DEFAULT_TIMEZONE):
+        self.default_name = default
+        self._guild_tz = {}
+
+    @property
+    def default(self):
+        # Resolved on first use so constructing this doesn't load pytz
+        return get_timezone(self.default_name)
+
+    def get(self, guild_id):
+        local_tz = self._guild_tz.get(guild_id)
+        return local_tz if local_tz is not None else self.default
+
+    def set(self, guild_id, name):
+        # Raises pytz.UnknownTimeZoneError for names that don't exist
+        self._guild_tz[guild_id] = get_timezone(name)
+        return self._guild_tz[guild_id]
+
+
+def local_date(dt, tz):
+    return dt.astimezone(tz).date()
+
+
+def local_to_utc(day, minutes, tz):
+    '''
+
+    Converts minutes past local midnight on day (1440+ means the next day) to an aware UTC datetime
+
+    '''
+    local_midnight = datetime.combine(day, datetime.min.time())
+    return tz.localize(local_midnight + timedelta(minutes=minutes)).astimezone(timezone.utc)
+
+
+def slots_to_utc(day, slots, tz):
+    '''
+
+    Converts [(start_minute, end_minute, ...), ...] on a local day to [(start_utc, end_utc), ...] in one call.
+    The UTC offset is looked up once per day; only days with a DST change fall back to per-slot localize.
+
+    '''
+    if not slots:
+        return []
+    local_midnight = datetime.combine(day, datetime.min.time())
+    first_offset = tz.localize(local_midnight).utcoffset()
+    last_offset = tz.localize(local_midnight + timedelta(days=2)).utcoffset()
+    if first_offset != last_offset:
+        return [(local_to_utc(day, slot[0], tz), local_to_utc(day, slot[1], tz)) for slot in slots]
+
+    utc_midnight = (local_midnight - first_offset).replace(tzinfo=timezone.utc)
+    return [(utc_midnight + timedelta(minutes=slot[0]), utc_midnight + timedelta(minutes=slot[1])) for slot in slots]
+
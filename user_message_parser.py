@@ -1,6 +1,8 @@
 import re
+from dataclasses import dataclass
 from datetime import datetime, timezone, timedelta, date
-import pytz
+from time_tokens import MINUTES_PER_DAY, format_clock, parse_clock
+from timezones import DEFAULT_TIMEZONE, get_timezone
 
 
 '''
@@ -27,57 +29,365 @@ Check In Code: P7T4
 
 
 '''
-def get_event_parameters_from_GT(message: str):
+@dataclass(slots=True, frozen=True)
+class Booking:
+    '''
+
+    One parsed booking confirmation. start_time/end_time are timezone-aware local datetimes
+
+    '''
+    event_name: str
+    location: str
+    checkin_code: str
+    start_time: datetime
+    end_time: datetime
+
+    @property
+    def start_utc(self):
+        return self.start_time.astimezone(timezone.utc)
+
+    @property
+    def end_utc(self):
+        return self.end_time.astimezone(timezone.utc)
+
+    @property
+    def slot(self):
+        # (start_minute, end_minute, code) in local time-of-day minutes, the form SlotSet and the booking store use.
+        # Read off the wall clock rather than the elapsed time, which is an hour off on DST change days
+        start = self.start_time.hour * 60 + self.start_time.minute
+        end = self.end_time.hour * 60 + self.end_time.minute
+        if end <= start:
+            end += MINUTES_PER_DAY
+        return start, end, self.checkin_code
+
+    @property
+    def description(self):
+        # Same "%I:%M%p - %I:%M%p: CODE" line the bot has always written into event descriptions
+        start = format_clock(self.start_time.hour * 60 + self.start_time.minute, zero_pad=True)
+        end = format_clock(self.end_time.hour * 60 + self.end_time.minute, zero_pad=True)
+        return f'{start} - {end}: {self.checkin_code}'
+
+    def to_event_data(self):
+        '''
+
+        Compatibility view: the hashmap of ISO 8601 strings get_event_parameters_from_GT used to build
+
+        '''
+        return {
+            "event_name": self.event_name,
+            "location": self.location,
+            "description": self.description,
+            "start_time": self.start_utc.isoformat(),  # e.g., "2024-11-17T23:00:00+00:00"
+            "end_time": self.end_utc.isoformat()       # e.g., "2024-11-18T01:00:00+00:00"
+        }
+
+
+# Email formats the bot understands: name -> (anchor regex, parser(message, local_tz) -> Booking).
+# The anchor matches the line only that booking system's confirmations start with.
+EMAIL_FORMATS = {}
+
+
+def _build_dispatch_patterns():
+    # All anchors in one alternation, so picking the parser is a single scan of the text no matter
+    # how many formats are registered; match.lastgroup says which one matched
+    names = list(EMAIL_FORMATS)
+    anchors = [EMAIL_FORMATS[name][0] for name in names]
+    dispatch = re.compile("|".join(f"(?P<format_{index}>{anchor})" for index, anchor in enumerate(anchors)), re.MULTILINE)
+    split = re.compile("(?=" + "|".join(f"(?:{anchor})" for anchor in anchors) + ")", re.MULTILINE)
+    return names, dispatch, split
+
+
+def register_email_format(name, anchor):
+    '''
+
+    Decorator registering parser(message, local_tz) -> Booking for confirmations that start with `anchor`.
+    Anchors are regexes and must not contain capturing groups
+
+    '''
+    def decorator(parser):
+        global _FORMAT_NAMES, DISPATCH_PATTERN, CONFIRMATION_SPLIT_PATTERN
+        EMAIL_FORMATS[name] = (anchor, parser)
+        _FORMAT_NAMES, DISPATCH_PATTERN, CONFIRMATION_SPLIT_PATTERN = _build_dispatch_patterns()
+        return parser
+    return decorator
+
+
+def detect_email_format(message: str):
+    '''
 
-    event_name_match = re.search(r'The following bookings "(.*?)" have been confirmed:', message)
-    event_name = event_name_match.group(1) if event_name_match else None
+    Returns the name of the format of the first confirmation in message, or None
 
-    location_match = re.search(r'Space: (.+)', message)
-    location = location_match.group(1) if location_match else None
-    
-    # Extract Check-in Code
-    checkin_code_match = re.search(r'Check In Code: (.+)', message)
-    checkin_code = checkin_code_match.group(1) if checkin_code_match else None
+    '''
+    match = DISPATCH_PATTERN.search(message)
+    return _FORMAT_NAMES[int(match.lastgroup[len("format_"):])] if match else None
+
+
+def parse_booking(message: str, local_tz=None):
+    '''
+
+    Parses one confirmation email of any registered format into a Booking
 
-    date_match = re.search(r'Date: [A-Za-z]+, ([A-Za-z]+ \d{1,2}, \d{4})', message)
-    time_match = re.search(r'Time: (\d{1,2}:\d{2}[apm]+) - (\d{1,2}:\d{2}[apm]+)', message)
-    
-    if not date_match or not time_match:
+    '''
+    name = detect_email_format(message)
+    if name is None:
         raise ValueError("Invalid input format")
-    
-    # Extract date and times
-    date = date_match.group(1)  # e.g., "November 17, 2024"
-    start_time = time_match.group(1)  # e.g., "6:00pm"
-    end_time = time_match.group(2)  # e.g., "8:00pm"
-
-    # Combine date and time into datetime objects
-    start_datetime = datetime.strptime(f"{date} {start_time}", "%B %d, %Y %I:%M%p")
-    end_datetime = datetime.strptime(f"{date} {end_time}", "%B %d, %Y %I:%M%p")
-    
-    # Localize datetime to a specific timezone (e.g., 'America/New_York')
-    local_tz = pytz.timezone("America/New_York")  # Replace with your timezone
-    start_datetime = local_tz.localize(start_datetime)  # Attach local timezone
-    end_datetime = local_tz.localize(end_datetime)
-    
-    # Convert to UTC
-    start_datetime_utc = start_datetime.astimezone(timezone.utc)
-    end_datetime_utc = end_datetime.astimezone(timezone.utc)
-
-    # Convert to ISO 8601 format
-    start_iso = start_datetime_utc.isoformat()  # e.g., "2024-11-17T23:00:00Z"
-    end_iso = end_datetime_utc.isoformat()      # e.g., "2024-11-18T01:00:00Z"
-    
-    formatted_start_time = start_datetime.strftime("%I:%M%p")  # Capital AM/PM
-    formatted_end_time = end_datetime.strftime("%I:%M%p")      # Capital AM/PM
-    description = f'{formatted_start_time} - {formatted_end_time}: {checkin_code}'
-    
-    return {
-        "event_name": event_name,
-        "location": location,
-        "description": description,
-        "start_time": start_iso,
-        "end_time": end_iso
-    }
+    return EMAIL_FORMATS[name][1](message, local_tz or get_timezone(DEFAULT_TIMEZONE))
+
+
+def _scan_fields(pattern, message):
+    fields = {}
+    for match in pattern.finditer(message):
+        # Only one alternative matched, so keep whichever groups it filled in (first occurrence wins)
+        for name, value in match.groupdict().items():
+            if value is not None and name not in fields:
+                fields[name] = value
+        # Stop as soon as everything has been found
+        if len(fields) == len(pattern.groupindex):
+            break
+    return fields
+
+
+def _booking_from_fields(fields, booking_date, local_tz):
+    # Events are matched by room and descriptions list check-in codes, so a booking without either is unusable
+    if not fields.get("location", "").strip() or not fields.get("checkin_code", "").strip():
+        raise ValueError("Invalid input format: missing room or check-in code")
+    local_midnight = datetime(booking_date.year, booking_date.month, booking_date.day)
+    start_datetime = local_midnight + timedelta(minutes=parse_clock(fields["start"]))
+    end_datetime = local_midnight + timedelta(minutes=parse_clock(fields["end"]))
+    # A booking that ends at or after midnight (e.g. 10:00pm - 12:00am) ends the next day
+    if end_datetime <= start_datetime:
+        end_datetime += timedelta(days=1)
+
+    return Booking(
+        # EMS confirmations may leave out "Event Name:"; like schedule_recurring, the room then names the event
+        event_name=fields.get("event_name", "").strip() or fields["location"].strip(),
+        location=fields.get("location"),
+        checkin_code=fields.get("checkin_code"),
+        start_time=local_tz.localize(start_datetime),  # Attach local timezone
+        end_time=local_tz.localize(end_datetime)
+    )
+
+
+# One pattern for every field we care about, so the email is only scanned once.
+# Lines that don't start with one of these labels (the boilerplate paragraphs) fail on their first characters.
+GT_FIELD_PATTERN = re.compile(
+    r'^[ \t]*(?:'
+    r'The following bookings "(?P<event_name>.*?)" have been confirmed:'
+    r'|Space: (?P<location>.+)'
+    r'|Date: [A-Za-z]+, (?P<month>[A-Za-z]+) (?P<day>\d{1,2}), (?P<year>\d{4})'
+    r'|Time: (?P<start>\d{1,2}:\d{2}[AaPp][Mm]) - (?P<end>\d{1,2}:\d{2}[AaPp][Mm])'
+    r'|Check In Code: (?P<checkin_code>.+)'
+    r')',
+    re.MULTILINE
+)
+
+MONTHS = {month: number for number, month in enumerate(
+    ["january", "february", "march", "april", "may", "june", "july",
+     "august", "september", "october", "november", "december"], start=1)}
+
+
+@register_email_format("georgia_tech", r'The following bookings "[^"\n]*" have been confirmed:')
+def parse_booking_from_GT(message: str, local_tz=None):
+    '''
+
+    Parses a Georgia Tech booking confirmation into a Booking in a single pass over the text
+
+    '''
+    fields = _scan_fields(GT_FIELD_PATTERN, message)
+    month = MONTHS.get(fields.get("month", "").lower())
+    if month is None or "start" not in fields:
+        raise ValueError("Invalid input format")
+    return _booking_from_fields(fields, date(int(fields["year"]), month, int(fields["day"])), local_tz or get_timezone(DEFAULT_TIMEZONE))
+
+
+# EMS reservation confirmations look like:
+#
+#   Reservation Confirmed
+#   Event Name: STUDY SLAY
+#   Room: CULC 152
+#   Date: 11/17/2024
+#   Time: 6:00 PM - 8:00 PM
+#   Confirmation #: 24117731
+EMS_FIELD_PATTERN = re.compile(
+    r'^[ \t]*(?:'
+    r'Event Name: (?P<event_name>.+)'
+    r'|Room: (?P<location>.+)'
+    r'|Date: (?P<month>\d{1,2})/(?P<day>\d{1,2})/(?P<year>\d{4})'
+    r'|Time: (?P<start>\d{1,2}:\d{2} ?[AaPp][Mm]) - (?P<end>\d{1,2}:\d{2} ?[AaPp][Mm])'
+    r'|Confirmation #: (?P<checkin_code>\S+)'
+    r')',
+    re.MULTILINE
+)
+
+
+@register_email_format("ems", r'^[ \t]*Reservation Confirmed[ \t]*$')
+def parse_booking_from_EMS(message: str, local_tz=None):
+    '''
+
+    Parses an EMS reservation confirmation into a Booking
+
+    '''
+    fields = _scan_fields(EMS_FIELD_PATTERN, message)
+    if "month" not in fields or "start" not in fields:
+        raise ValueError("Invalid input format")
+    return _booking_from_fields(fields, date(int(fields["year"]), int(fields["month"]), int(fields["day"])), local_tz or get_timezone(DEFAULT_TIMEZONE))
+
+
+def get_event_parameters_from_GT(message: str):
+    '''
+
+    Returns the booking as a hashmap of strings (see Booking.to_event_data)
+
+    '''
+    return parse_booking_from_GT(message).to_event_data()
+
+
+def split_confirmations(message: str):
+    '''
+
+    Splits a message containing many pasted confirmation emails (any mix of formats) into one string per confirmation
+
+    '''
+    # Each confirmation starts with its format's anchor, which marks where one email ends and the next begins
+    return [chunk for chunk in CONFIRMATION_SPLIT_PATTERN.split(message) if DISPATCH_PATTERN.match(chunk)]
+
+
+def text_from_attachment(filename: str, data: bytes):
+    '''
+
+    Returns the text of a .txt or .eml attachment (None for anything else)
+
+    '''
+    filename = filename.lower()
+    if filename.endswith(".txt"):
+        return data.decode("utf-8", errors="replace")
+    if filename.endswith(".eml"):
+        # The email package is only needed for .eml attachments, so it isn't loaded at startup
+        from email import message_from_bytes, policy
+        email_message = message_from_bytes(data, policy=policy.default)
+        body = email_message.get_body(preferencelist=("plain",))
+        return body.get_content() if body is not None else None
+    return None
+
+
+# Matches one "6:00PM - 8:00PM: P7T4" line of an event description
+SLOT_PATTERN = re.compile(r'(\d{1,2}:\d{2}[AaPp][Mm]) - (\d{1,2}:\d{2}[AaPp][Mm]): (\S+)')
+
+def unwrap_midnight(slots):
+    '''
+
+    Takes sorted (start_minute, end_minute, ...) tuples and returns a new list in the order the slots actually happen:
+    slots that continue a run past midnight (e.g. "12:00AM - 1:00AM" after "10:00PM - 12:00AM") sort first by
+    time of day, so they are moved to the end and shifted by a day (+1440). The input is not modified.
+
+    '''
+    if not slots:
+        return []
+    # How far past midnight the latest run reaches, in next-day minutes
+    wrap_until = max(slot[1] for slot in slots) - MINUTES_PER_DAY
+    wrapped = 0
+    while wrapped < len(slots) and slots[wrapped][0] <= wrap_until:
+        wrap_until = max(wrap_until, slots[wrapped][1])
+        wrapped += 1
+    if wrapped == 0 or wrapped == len(slots):
+        return list(slots)
+    return list(slots[wrapped:]) + [(slot[0] + MINUTES_PER_DAY, slot[1] + MINUTES_PER_DAY) + tuple(slot[2:]) for slot in slots[:wrapped]]
+
+
+def merge_intervals(slots):
+    '''
+
+    Merges pre-sorted (start_minute, end_minute, ...) tuples in one pass.
+    Returns ([(run_start, run_end), ...], longest run or None); overlapping and adjacent slots share a run.
+
+    '''
+    runs = []
+    longest = None
+    for slot in slots:
+        start, end = slot[0], slot[1]
+        if runs and start <= runs[-1][1]:  # Overlapping or adjacent, extend the current run
+            if end > runs[-1][1]:
+                runs[-1] = (runs[-1][0], end)
+            continue
+        if runs and (longest is None or runs[-1][1] - runs[-1][0] > longest[1] - longest[0]):
+            longest = runs[-1]
+        runs.append((start, end))
+    # Final check for the last run
+    if runs and (longest is None or runs[-1][1] - runs[-1][0] > longest[1] - longest[0]):
+        longest = runs[-1]
+    return runs, longest
+
+
+class SlotSet:
+    '''
+
+    The time slots of an event description, parsed once into (start_minute, end_minute, code) tuples
+    in the order they happen. Minutes count from local midnight of the event's day; anything past midnight
+    is 1440+ so durations and comparisons stay plain integer math.
+
+    '''
+    __slots__ = ("slots",)
+
+    def __init__(self, slots=()):
+        self.slots = unwrap_midnight(sorted(slots))
+
+    @classmethod
+    def from_description(cls, event_description):
+        slots = []
+        for start_time_str, end_time_str, code in SLOT_PATTERN.findall(event_description or ""):
+            start = parse_clock(start_time_str)
+            end = parse_clock(end_time_str)
+            if end <= start:
+                end += MINUTES_PER_DAY
+            slots.append((start, end, code))
+        return cls(slots)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __iter__(self):
+        return iter(self.slots)
+
+    def union(self, slot_set):
+        '''
+
+        Returns a new SlotSet with the slots of both, listing identical slots only once
+
+        '''
+        slots = {(start % MINUTES_PER_DAY, start % MINUTES_PER_DAY + end - start, code) for start, end, code in self.slots + slot_set.slots}
+        return SlotSet(slots)
+
+    def runs(self):
+        return merge_intervals(self.slots)[0]
+
+    def find_gap(self):
+        '''
+
+        Returns (gap_start, gap_end) in minutes for the first gap between slots, or None if they are continuous
+
+        '''
+        runs = self.runs()
+        if len(runs) < 2:
+            return None
+        return runs[0][1], runs[1][0]
+
+    def largest_interval(self):
+        '''
+
+        Returns (start, end) in minutes of the longest run of overlapping/adjacent slots, or None
+
+        '''
+        return merge_intervals(self.slots)[1]
+
+    def serialize(self):
+        # Rebuild the event description, one slot per line in the order they happen
+        return "\n".join(f"{format_clock(start)} - {format_clock(end)}: {code}" for start, end, code in self.slots)
+
+
+def merge_descriptions(first_description, second_description):
+    # Combines two descriptions of the same event without losing or repeating lines
+    return SlotSet.from_description(first_description).union(SlotSet.from_description(second_description)).serialize()
+
 
 def check_description_for_gaps(event_description):
     '''
@@ -85,40 +395,15 @@ def check_description_for_gaps(event_description):
     Takes in a string(event description) and outputs a hashmap of an gap(what makes the times not continuous)
 
     '''
-    # This regular expression matches time periods and their associated check-in codes
-    time_pattern = r'(\d{1,2}:\d{2}[apm]+) - (\d{1,2}:\d{2}[apm]+): (\S+)'
-
-    # Find all the time ranges and associated check-in codes in the description
-    time_slots = re.findall(time_pattern, event_description)
-    # Convert times to datetime objects
-    time_slots_with_dt = []
-    for start_time_str, end_time_str, code in time_slots:
-        # Parse times using the correct format
-        start_time = datetime.strptime(start_time_str, "%I:%M%p")
-        end_time = datetime.strptime(end_time_str, "%I:%M%p")
-        time_slots_with_dt.append((start_time, end_time, code))
-
-    # Sort the time slots by start time
-    time_slots_with_dt.sort(key=lambda x: x[0])
-
-    # Check for gaps between consecutive time slots
-    for i in range(1, len(time_slots_with_dt)):
-        prev_end_time = time_slots_with_dt[i - 1][1]
-        curr_start_time = time_slots_with_dt[i][0]
-
-        # If there is a gap between the end of one time slot and the start of the next
-        if prev_end_time < curr_start_time:
-            gap_start_time = prev_end_time
-            gap_end_time = curr_start_time
-            # Return the gap in the form of a time range (e.g., "2:00pm - 4:00pm")
-            gap  = {
-                "start_time": gap_start_time.strftime('%I:%M%p').lstrip('0'),
-                "end_time": gap_end_time.strftime('%I:%M%p').lstrip('0')
-            }
-            return gap
-
-    # No gap found, return None
-    return None
+    gap = SlotSet.from_description(event_description).find_gap()
+    if gap is None:
+        # No gap found, return None
+        return None
+    # Return the gap in the form of a time range (e.g., "2:00PM - 4:00PM")
+    return {
+        "start_time": format_clock(gap[0]),
+        "end_time": format_clock(gap[1])
+    }
 
 
 # def convert_time_to_eventTime_datetime(event, times_to_convert):
@@ -165,56 +450,19 @@ def sort_event_description(event_description):
     Takes in a string(the event description) and output a string of organized by time
 
     '''
-    # This regular expression matches time periods and their associated check-in codes
-    time_pattern = r'(\d{1,2}:\d{2}[APM]+) - (\d{1,2}:\d{2}[APM]+): (\S+)'
-
-    # Find all the time ranges and associated check-in codes in the description
-    time_slots = re.findall(time_pattern, event_description)
-    print("time_slots to sort: ", time_slots)
-    # Convert times to datetime objects
-    time_slots_with_dt = []
-    for start_time_str, end_time_str, code in time_slots:
-        # Parse times using the correct format
-        start_time = datetime.strptime(start_time_str, "%I:%M%p")
-        end_time = datetime.strptime(end_time_str, "%I:%M%p")
-        time_slots_with_dt.append((start_time, end_time, code))
-
-    print("time_slots_with_dt", time_slots_with_dt)
-    # Sort the time slots by start time
-    time_slots_with_dt.sort(key=lambda x: x[0])
-
-    # Rebuild the event description with the sorted time slots
-    sorted_description = ""
-    for start_time, end_time, code in time_slots_with_dt:
-        start_time_str = start_time.strftime("%I:%M%p").lstrip('0')  # Remove leading zero
-        end_time_str = end_time.strftime("%I:%M%p").lstrip('0')  # Remove leading zero
-        sorted_description += f"{start_time_str} - {end_time_str}: {code}\n"
-
-    return sorted_description.strip()  # Remove the trailing newline
+    return SlotSet.from_description(event_description).serialize()
 
 def parse_event_times_from_description(event_description):
-    print("event_description", event_description)
-    # Regular expression to match time ranges in the description
-    time_pattern = r"(\d{1,2}:\d{2}[APM]+) - (\d{1,2}:\d{2}[APM]+): (\S+)"
-
-    time_slots = re.findall(time_pattern, event_description)
-    print("timeslots: ", time_slots)
-    
-    time_slots_with_dt = []
-    for start_time_str, end_time_str, code in time_slots:
-        # Parse times into datetime objects
-        start_time = datetime.strptime(start_time_str, "%I:%M%p")
-        end_time = datetime.strptime(end_time_str, "%I:%M%p")
-        time_slots_with_dt.append({
-            "start_time": start_time,
-            "end_time": end_time,
-            "code": code
-        })
-    print("time_slots", time_slots_with_dt)
-    if not time_slots_with_dt:
-        print("no timeslots found")
+    # Compatibility view of SlotSet as the old list of {"start_time", "end_time", "code"} datetimes
+    slot_set = SlotSet.from_description(event_description)
+    if not slot_set:
         return None
-    return time_slots_with_dt
+    base = datetime(1900, 1, 1)
+    return [{
+        "start_time": base + timedelta(minutes=start % MINUTES_PER_DAY),
+        "end_time": base + timedelta(minutes=end % MINUTES_PER_DAY),
+        "code": code
+    } for start, end, code in slot_set]
 
 def find_largest_continuous_interval(time_slots):
     """
@@ -222,59 +470,27 @@ def find_largest_continuous_interval(time_slots):
 
     Args:
         time_slots (list): A list of dictionaries containing "start_time" and "end_time".
-                           Each "start_time" and "end_time" is a datetime.time object.
+                           Each "start_time" and "end_time" is a datetime object (only the time of day is used).
+                           The list is not modified.
 
     Returns:
         tuple: A tuple containing the earliest start time and the latest end time
-               for the largest continuous interval (datetime.time, datetime.time).
+               for the largest continuous interval (datetime, datetime), handling runs that cross midnight.
     """
     if not time_slots:
         return None
 
-    # Sort the time slots by start time
-    time_slots.sort(key=lambda x: x["start_time"])
-
-    # Initialize variables for tracking the largest continuous interval
-    current_start = time_slots[0]["start_time"]
-    current_end = time_slots[0]["end_time"]
-    largest_start = current_start
-    largest_end = current_end
-    max_duration = timedelta(0)
-
-    for i in range(1, len(time_slots)):
-        next_start = time_slots[i]["start_time"]
-        next_end = time_slots[i]["end_time"]
-
-        # Check if the current interval is continuous with the next
-        if next_start <= current_end:  # Overlapping or adjacent intervals
-            current_end = max(current_end, next_end)  # Extend the current interval
-        else:  # Non-continuous interval, finalize the current one
-            # Calculate duration of the current interval
-            current_interval_duration = (
-                datetime.combine(date.today(), current_end.time())
-                - datetime.combine(date.today(), current_start.time())
-            )
-
-            if current_interval_duration > max_duration:
-                max_duration = current_interval_duration
-                largest_start = current_start
-                largest_end = current_end
-
-            # Start a new interval
-            current_start = next_start
-            current_end = next_end
-
-    # Final check for the last interval
-    final_interval_duration = (
-        datetime.combine(date.today(), current_end.time())
-        - datetime.combine(date.today(), current_start.time())
-    )
-
-    if final_interval_duration > max_duration:
-        largest_start = current_start
-        largest_end = current_end
-
-    return largest_start, largest_end
+    slots = []
+    for slot in time_slots:
+        start = slot["start_time"].hour * 60 + slot["start_time"].minute
+        end = slot["end_time"].hour * 60 + slot["end_time"].minute
+        if end <= start:
+            end += MINUTES_PER_DAY
+        slots.append((start, end))
+
+    largest_start, largest_end = merge_intervals(unwrap_midnight(sorted(slots)))[1]
+    base = datetime(1900, 1, 1)
+    return base + timedelta(minutes=largest_start % MINUTES_PER_DAY), base + timedelta(minutes=largest_end % MINUTES_PER_DAY)
 
 
 
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from collections import deque
+
+import discord
+
+
+class _PendingEdit:
+    __slots__ = ("event", "fields", "futures", "queued_at")
+
+    def __init__(self, event):
+        self.event = event
+        self.fields = {}
+        self.futures = []
+        self.queued_at = time.perf_counter()
+
+
+class EventWriteQueue:
+    '''
+
+    Queues ScheduledEvent.edit calls and coalesces every edit to the same event that arrives within
+    `window` seconds into a single PATCH. Writes for one guild go out one at a time, since they share
+    Discord's scheduled-event rate-limit bucket, and a 429 is retried after the requested delay.
+
+    merge_description(pending, new) decides how two queued descriptions combine (default: the newer one wins).
+
+    '''
+
+    def __init__(self, window=0.25, merge_description=None, on_written=None, max_retries=3):
+        self.window = window
+        self.merge_description = merge_description
+        self.on_written = on_written
+        self.max_retries = max_retries
+        self._pending = {}  # event_id -> _PendingEdit
+        self._guild_locks = {}  # guild_id -> asyncio.Lock
+        self.writes = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.latencies = deque(maxlen=500)  # seconds from first queued edit to PATCH done
+
+    def pending_fields(self, event_id):
+        '''
+
+        Fields queued for an event but not yet written (empty dict if nothing is queued)
+
+        '''
+        pending = self._pending.get(event_id)
+        return dict(pending.fields) if pending else {}
+
+    def submit(self, event, **fields):
+        '''
+
+        Queues an edit and returns a future that resolves to the edited ScheduledEvent
+
+        '''
+        pending = self._pending.get(event.id)
+        if pending is None:
+            pending = self._pending[event.id] = _PendingEdit(event)
+            asyncio.ensure_future(self._flush_later(event.id))
+        else:
+            self.coalesced += 1
+
+        if "description" in fields and "description" in pending.fields and self.merge_description:
+            fields["description"] = self.merge_description(pending.fields["description"], fields["description"])
+        pending.fields.update(fields)
+
+        future = asyncio.get_running_loop().create_future()
+        pending.futures.append(future)
+        return future
+
+    async def _flush_later(self, event_id):
+        await asyncio.sleep(self.window)
+        pending = self._pending.pop(event_id)
+        guild_lock = self._guild_locks.setdefault(pending.event.guild_id, asyncio.Lock())
+        async with guild_lock:
+            try:
+                edited_event = await self._edit(pending)
+            except Exception as e:
+                for future in pending.futures:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+        self.writes += 1
+        self.latencies.append(time.perf_counter() - pending.queued_at)
+        if self.on_written:
+            self.on_written(edited_event)
+        for future in pending.futures:
+            if not future.done():
+                future.set_result(edited_event)
+
+    async def _edit(self, pending):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await pending.event.edit(**pending.fields)
+            except discord.HTTPException as e:
+                if e.status != 429 or attempt == self.max_retries:
+                    raise
+                # discord.py retries most 429s itself; anything that still surfaces waits out the bucket here
+                self.rate_limited += 1
+                retry_after = getattr(e, "retry_after", None) or 1.0
+                await asyncio.sleep(retry_after)
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            "depth": len(self._pending),
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "rate_limited": self.rate_limited,
+            "latency_avg": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_max": latencies[-1] if latencies else 0.0,
+        }